@@ -15,10 +15,56 @@ This allows projects to use either:
 3. Both (local .env takes precedence)
 """
 
+import json
 import os
+import sys
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Loaded .env files keyed by resolved start directory
+_LOAD_CACHE = {}
+
+# Variables whose values are masked in diagnostic output
+SECRET_SUFFIXES = ("API_KEY", "PASSWORD")
+
+# Marker names present in each scanned directory
+_SCAN_CACHE = {}
+
+# Environment variable recording the .env files already loaded (JSON, keyed
+# like _LOAD_CACHE). Child processes inherit it along with the loaded values,
+# so worker processes that re-import a module skip the .env search.
+_LOADED_ENV_VAR = "DOCUMENT_IMAGE_SEARCH_ENV_LOADED"
+
+
+def _inherited_loads():
+    """Return the loads recorded in the environment by a parent process."""
+    try:
+        return json.loads(os.environ.get(_LOADED_ENV_VAR, "{}"))
+    except ValueError:
+        return {}
+
+
+def _marker_names(directory):
+    """
+    Return which of '.env' / '.git' exist in a directory.
+
+    Uses a single os.scandir pass (one getdents) instead of a stat per marker,
+    falling back to Path.exists() if the directory cannot be listed.
+    """
+    if directory in _SCAN_CACHE:
+        return _SCAN_CACHE[directory]
+
+    markers = ('.env', '.git')
+    try:
+        with os.scandir(directory) as entries:
+            names = {entry.name for entry in entries if entry.name in markers}
+    except OSError:
+        names = {name for name in markers if (directory / name).exists()}
+
+    _SCAN_CACHE[directory] = names
+    return names
+
 
 def load_config(start_path=None):
     """
@@ -30,44 +76,64 @@ def load_config(start_path=None):
 
     Local .env files take precedence over parent .env files.
 
+    Results are cached per starting directory, so repeated calls (e.g. from
+    several modules imported into the same process) skip the filesystem search.
+
     Args:
         start_path: Optional starting directory (defaults to current file's directory)
     """
     if start_path is None:
         # Use the calling script's directory
-        import inspect
-        frame = inspect.currentframe()
-        caller_frame = frame.f_back
-        start_path = Path(caller_frame.f_globals['__file__']).parent
+        start_path = Path(sys._getframe(1).f_globals['__file__']).parent
     else:
         start_path = Path(start_path)
 
     current_path = start_path.resolve()
+    if current_path in _LOAD_CACHE:
+        return _LOAD_CACHE[current_path]
+
+    # Loaded by a parent process: the values are already in os.environ
+    inherited = _inherited_loads()
+    if str(current_path) in inherited:
+        _LOAD_CACHE[current_path] = inherited[str(current_path)]
+        return _LOAD_CACHE[current_path]
+
     loaded_files = []
 
-    # Search up the directory tree for .env files
-    max_levels = 5  # Prevent infinite loops
-    for _ in range(max_levels):
-        env_file = current_path / '.env'
-        if env_file.exists():
+    # Search up the directory tree for .env files (parents ends at filesystem root)
+    max_levels = 5
+    for directory in [current_path, *current_path.parents][:max_levels]:
+        names = _marker_names(directory)
+        if '.env' in names:
+            env_file = directory / '.env'
             # Load with override=False so local variables take precedence
             load_dotenv(env_file, override=False)
             loaded_files.append(str(env_file))
 
-        # Check if we've reached the project root (contains .git or is filesystem root)
-        if (current_path / '.git').exists() or current_path == current_path.parent:
+        # Stop once we've reached the project root (contains .git)
+        if '.git' in names:
             break
 
-        current_path = current_path.parent
-
-    if loaded_files:
-        return loaded_files
-    else:
+    if not loaded_files:
         # Still try to load from current directory as fallback
         load_dotenv(override=False)
-        return []
 
+    _LOAD_CACHE[current_path] = loaded_files
+    inherited[str(current_path)] = loaded_files
+    os.environ[_LOADED_ENV_VAR] = json.dumps(inherited)
+    return loaded_files
+
+
+def _clear_caches():
+    _LOAD_CACHE.clear()
+    _SCAN_CACHE.clear()
+    os.environ.pop(_LOADED_ENV_VAR, None)
 
+
+load_config.cache_clear = _clear_caches
+
+
+@lru_cache(maxsize=1)
 def get_project_root():
     """
     Find the project root directory (where .git exists or top-level directory).
@@ -91,7 +157,8 @@ def get_project_root():
     return Path.cwd()
 
 
-if __name__ == "__main__":
+def _print_diagnostics():
+    """Print which .env files were loaded and a masked sample of the configuration."""
     # Test the config loader
     print("Testing configuration loader...")
     print(f"Current directory: {Path.cwd()}")
@@ -120,7 +187,7 @@ if __name__ == "__main__":
         value = os.getenv(var)
         if value:
             # Show only first/last chars for API keys
-            if 'API_KEY' in var or 'PASSWORD' in var:
+            if var.endswith(SECRET_SUFFIXES):
                 if len(value) > 8:
                     masked = f"{value[:4]}...{value[-4:]}"
                 else:
@@ -130,3 +197,7 @@ if __name__ == "__main__":
                 print(f"  {var}: {value}")
         else:
             print(f"  {var}: <not set>")
+
+
+if __name__ == "__main__":
+    _print_diagnostics()
@@ -5,13 +5,13 @@ AI Agent for answering questions about documents using Elastic search and image
 
 import os
 import asyncio
+import hashlib
 import json
+import shutil
 import sys
+import threading
+import orjson
 from pathlib import Path
-from anthropic import Anthropic
-from openai import OpenAI
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 
 # Add parent directory to path to import config_loader
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -20,6 +20,55 @@ from config_loader import load_config
 # Load environment variables (checks local and parent directories)
 load_config()
 
+# On-disk cache of discovered MCP tools, for warm starts
+TOOL_CACHE_ENABLED = os.getenv("MCP_TOOL_CACHE_ENABLED", "true").lower() != "false"
+TOOL_CACHE_DIR = Path(os.getenv("MCP_TOOL_CACHE_DIR", "~/.cache/document_image_search")).expanduser()
+TOOL_CACHE_VERSION = 1
+
+# Mark the static prompt prefix (tools + system prompt) and the latest turn as
+# cacheable on Anthropic; OpenAI caches stable prefixes automatically
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() != "false"
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+def _preview(content, n=200):
+    """Return the first n characters of tool result content for logging.
+
+    Slices the first text block directly rather than stringifying every block.
+    """
+    if isinstance(content, str):
+        return content[:n]
+    if content and hasattr(content[0], "text"):
+        return content[0].text[:n]
+    return str(content)[:n]
+
+
+async def _ainput(prompt: str) -> str:
+    """input() without blocking the event loop.
+
+    Reads on a daemon thread rather than asyncio.to_thread: on Ctrl-C,
+    asyncio.run() joins its executor threads and would wait for a pending read.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def read():
+        try:
+            outcome = (future.set_result, input(prompt))
+        except Exception as e:  # EOFError on Ctrl-D
+            outcome = (future.set_exception, e)
+        try:
+            loop.call_soon_threadsafe(deliver, *outcome)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
 
 class DocumentAgent:
     """Agent that answers questions about documents using MCP tools."""
@@ -28,17 +77,21 @@ class DocumentAgent:
         """Initialize the agent with API keys and configuration."""
         self.provider = os.getenv("AI_PROVIDER", "anthropic").lower()
 
+        # Provider SDKs are imported lazily so only the selected one is loaded
         if self.provider == "anthropic":
+            from anthropic import AsyncAnthropic
             self.api_key = os.getenv("ANTHROPIC_API_KEY")
             if not self.api_key:
                 raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-            self.client = Anthropic(api_key=self.api_key)
+            # Async client so concurrent questions don't block the event loop
+            self.client = AsyncAnthropic(api_key=self.api_key)
             self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5-20250929")
         elif self.provider == "openai":
+            from openai import AsyncOpenAI
             self.api_key = os.getenv("OPENAI_API_KEY")
             if not self.api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables")
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = AsyncOpenAI(api_key=self.api_key)
             self.model = os.getenv("OPENAI_MODEL", "gpt-4-turbo-preview")
         else:
             raise ValueError(f"Unsupported AI provider: {self.provider}. Choose 'anthropic' or 'openai'")
@@ -56,7 +109,14 @@ class DocumentAgent:
             "4) Synthesize information from both document content and image analysis to provide a comprehensive answer."
         )
 
+        # System prompt as a content block, so it can carry a cache breakpoint
+        self._claude_system = [{"type": "text", "text": self.system_prompt}]
+        if PROMPT_CACHE_ENABLED:
+            self._claude_system[0]["cache_control"] = _EPHEMERAL
+
         # MCP server configurations
+        from mcp import StdioServerParameters
+
         self.elastic_search_config = StdioServerParameters(
             command=os.getenv("ELASTIC_SEARCH_MCP_COMMAND", "node"),
             args=[os.getenv("ELASTIC_SEARCH_MCP_ARGS", "")],
@@ -70,73 +130,163 @@ class DocumentAgent:
         )
 
         self.tools = []
-        self.tool_call_callback = None  # Optional callback for UI
+        self._tools_by_name = {}
+        self._claude_tools = []  # Provider-specific tool schemas, built once tools are loaded
+        self._openai_tools = []
+        self.tool_call_callback = None  # Optional UI callback: (tool_name, arguments dict, result text)
+
+        self._server_configs = {
+            "elastic_search": self.elastic_search_config,
+            "image_analysis": self.image_analysis_config,
+        }
+        self._server_labels = {
+            "elastic_search": "Elastic Search",
+            "image_analysis": "Image Analysis",
+        }
+
+        # Long-lived MCP sessions, opened on first use by _get_session()
+        self._sessions = {}
+        self._session_owners = {}  # server -> (owner task, close event)
+        self._session_locks = {server: asyncio.Lock() for server in self._server_configs}
 
     async def connect_mcp_servers(self):
-        """Connect to MCP servers and retrieve available tools."""
-        print("Connecting to MCP servers...")
+        """Connect to MCP servers and retrieve available tools.
 
-        # Connect to Elastic Search MCP server
-        async with stdio_client(self.elastic_search_config) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                elastic_tools = await session.list_tools()
+        Sessions are kept open for the lifetime of the agent so tool calls reuse
+        the running server processes; call aclose() to shut them down.
 
-                for tool in elastic_tools.tools:
-                    self.tools.append({
-                        "name": tool.name,
-                        "description": tool.description,
-                        "input_schema": tool.inputSchema,
-                        "server": "elastic_search"
-                    })
-                    print(f"  - Loaded tool: {tool.name} (Elastic Search)")
-
-        # Connect to Image Analysis MCP server
-        async with stdio_client(self.image_analysis_config) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                image_tools = await session.list_tools()
+        Discovered tools are cached on disk per server command/args; on a warm
+        start the cached tools are used and the server is only started on its
+        first tool call.
+        """
+        print("Connecting to MCP servers...")
 
-                for tool in image_tools.tools:
-                    self.tools.append({
+        for server, label in self._server_labels.items():
+            config = self._server_configs[server]
+            tools = self._load_cached_tools(config)
+            if tools is None:
+                session = await self._get_session(server)
+                server_tools = await session.list_tools()
+                tools = [
+                    {
                         "name": tool.name,
                         "description": tool.description,
-                        "input_schema": tool.inputSchema,
-                        "server": "image_analysis"
-                    })
-                    print(f"  - Loaded tool: {tool.name} (Image Analysis)")
+                        "input_schema": tool.inputSchema
+                    }
+                    for tool in server_tools.tools
+                ]
+                self._save_cached_tools(config, tools)
+                source = label
+            else:
+                source = f"{label}, cached"
+
+            for tool in tools:
+                tool_info = {**tool, "server": server}
+                self.tools.append(tool_info)
+                self._tools_by_name[tool_info["name"]] = tool_info
+                print(f"  - Loaded tool: {tool_info['name']} ({source})")
 
+        self._build_provider_tools()
         print(f"Total tools loaded: {len(self.tools)}\n")
 
-    async def call_tool(self, tool_name: str, arguments: dict):
-        """Execute a tool call on the appropriate MCP server."""
-        # Find which server this tool belongs to
-        tool_info = next((t for t in self.tools if t["name"] == tool_name), None)
-        if not tool_info:
-            raise ValueError(f"Tool {tool_name} not found")
+    async def _get_session(self, server: str):
+        """Return the open session for a server, starting it on first use.
 
-        server = tool_info["server"]
-
-        # Connect to the appropriate server and execute the tool
-        if server == "elastic_search":
-            async with stdio_client(self.elastic_search_config) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(tool_name, arguments)
-                    return result
-        elif server == "image_analysis":
-            async with stdio_client(self.image_analysis_config) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(tool_name, arguments)
-                    return result
-        else:
+        Concurrent first uses wait on a per-server lock, so only one server
+        process is started. The session's contexts are owned by a dedicated
+        task (see _run_session), not by whichever task happened to call first.
+        """
+        session = self._sessions.get(server)
+        if session is not None:
+            return session
+
+        config = self._server_configs.get(server)
+        if config is None:
             raise ValueError(f"Unknown server: {server}")
 
-    async def _answer_with_anthropic(self, question: str) -> str:
-        """Answer question using Anthropic's Claude."""
-        # Prepare tools for Claude
-        claude_tools = [
+        async with self._session_locks[server]:
+            # Another task may have started it while we waited
+            session = self._sessions.get(server)
+            if session is not None:
+                return session
+
+            ready = asyncio.get_running_loop().create_future()
+            closing = asyncio.Event()
+            task = asyncio.create_task(self._run_session(server, config, ready, closing))
+            self._session_owners[server] = (task, closing)
+            try:
+                # Shielded: a cancelled caller must not cancel the shared startup
+                return await asyncio.shield(ready)
+            except Exception:
+                self._session_owners.pop(server, None)
+                raise
+
+    async def _run_session(self, server, config, ready, closing):
+        """Open a server's session, hold it until aclose(), then close it.
+
+        stdio_client and ClientSession use anyio cancel scopes, which must be
+        exited by the task that entered them, so one task does both.
+        """
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        try:
+            async with stdio_client(config) as (read, write), ClientSession(read, write) as session:
+                await session.initialize()
+                self._sessions[server] = session
+                ready.set_result(session)
+                await closing.wait()
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.cancel()
+            raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"Warning: MCP server '{server}' session ended with an error: {e}")
+        finally:
+            self._sessions.pop(server, None)
+
+    def _tool_cache_path(self, config) -> Path:
+        """Cache file for a server's tools, keyed by its command, args and their mtimes."""
+        parts = [config.command, *config.args]
+        mtimes = []
+        for part in parts:
+            try:
+                mtimes.append(str(os.stat(shutil.which(part) or part).st_mtime_ns))
+            except OSError:
+                pass
+        key = hashlib.sha1("\0".join(parts + mtimes).encode()).hexdigest()
+        return TOOL_CACHE_DIR / f"tools-{key}.json"
+
+    def _load_cached_tools(self, config):
+        """Return cached tools for a server, or None if caching is off or the cache is stale."""
+        if not TOOL_CACHE_ENABLED:
+            return None
+        try:
+            cached = orjson.loads(self._tool_cache_path(config).read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        if cached.get("version") != TOOL_CACHE_VERSION:
+            return None
+        return cached.get("tools")
+
+    def _save_cached_tools(self, config, tools):
+        """Write discovered tools to the cache (best effort)."""
+        if not TOOL_CACHE_ENABLED:
+            return
+        try:
+            TOOL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            self._tool_cache_path(config).write_bytes(
+                orjson.dumps({"version": TOOL_CACHE_VERSION, "tools": tools})
+            )
+        except (OSError, TypeError) as e:
+            print(f"  Warning: Could not write tool cache: {e}")
+
+    def _build_provider_tools(self):
+        """Precompute the tool schemas sent to each provider on every LLM turn."""
+        self._claude_tools = [
             {
                 "name": tool["name"],
                 "description": tool["description"],
@@ -144,18 +294,53 @@ class DocumentAgent:
             }
             for tool in self.tools
         ]
+        self._openai_tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "parameters": tool["input_schema"]
+                }
+            }
+            for tool in self.tools
+        ]
+
+    async def aclose(self):
+        """Close MCP sessions and stop the server processes."""
+        owners = list(self._session_owners.values())
+        self._session_owners.clear()
+        for _, closing in owners:
+            closing.set()
+        # Each owner task exits its own contexts
+        await asyncio.gather(*(task for task, _ in owners), return_exceptions=True)
+        self._sessions.clear()
 
-        # Initialize conversation
+    async def call_tool(self, tool_name: str, arguments: dict):
+        """Execute a tool call on the appropriate MCP server."""
+        # Find which server this tool belongs to
+        tool_info = self._tools_by_name.get(tool_name)
+        if not tool_info:
+            raise ValueError(f"Tool {tool_name} not found")
+
+        session = await self._get_session(tool_info["server"])
+        return await session.call_tool(tool_name, arguments)
+
+    async def _answer_with_anthropic(self, question: str) -> str:
+        """Answer question using Anthropic's Claude."""
+        # Initialize conversation; tools and system prompt form the stable,
+        # cached prefix and the question plus tool turns follow it
         messages = [{"role": "user", "content": question}]
+        cache_marked = None  # Content block currently carrying the conversation breakpoint
 
         # Agent loop - continue until Claude provides a final answer
         while True:
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
-                system=self.system_prompt,
-                tools=claude_tools,
+                system=self._claude_system,
+                tools=self._claude_tools,
                 messages=messages
             )
 
@@ -180,25 +365,37 @@ class DocumentAgent:
                         tool_name = block.name
                         tool_input = block.input
 
+                        # Serialize once as compact JSON for the log line
+                        input_str = orjson.dumps(tool_input).decode()
+
                         print(f"Using tool: {tool_name}")
-                        print(f"  Input: {tool_input}")
+                        print(f"  Input: {input_str}")
 
                         # Execute tool
                         result = await self.call_tool(tool_name, tool_input)
 
-                        print(f"  Result: {result.content[:200]}...")
+                        content_str = str(result.content)
+                        print(f"  Result: {_preview(result.content)}...")
                         print()
 
                         # Call callback if provided (for UI)
                         if self.tool_call_callback:
-                            self.tool_call_callback(tool_name, tool_input, str(result.content))
+                            self.tool_call_callback(tool_name, tool_input, content_str)
 
                         tool_results.append({
                             "type": "tool_result",
                             "tool_use_id": block.id,
-                            "content": str(result.content)
+                            "content": content_str
                         })
 
+                # Move the conversation breakpoint to the newest turn so the next
+                # request reuses everything before it
+                if PROMPT_CACHE_ENABLED and tool_results:
+                    if cache_marked is not None:
+                        del cache_marked["cache_control"]
+                    cache_marked = tool_results[-1]
+                    cache_marked["cache_control"] = _EPHEMERAL
+
                 # Add tool results to messages
                 messages.append({"role": "user", "content": tool_results})
             else:
@@ -207,19 +404,6 @@ class DocumentAgent:
 
     async def _answer_with_openai(self, question: str) -> str:
         """Answer question using OpenAI's GPT."""
-        # Prepare tools for OpenAI
-        openai_tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "parameters": tool["input_schema"]
-                }
-            }
-            for tool in self.tools
-        ]
-
         # Initialize conversation with system prompt
         messages = [
             {"role": "system", "content": self.system_prompt},
@@ -228,11 +412,11 @@ class DocumentAgent:
 
         # Agent loop - continue until we get a final answer
         while True:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
-                tools=openai_tools,
+                tools=self._openai_tools,
                 messages=messages
             )
 
@@ -252,24 +436,28 @@ class DocumentAgent:
                     tool_name = tool_call.function.name
                     tool_input = json.loads(tool_call.function.arguments)
 
+                    # Serialize once as compact JSON for the log line
+                    input_str = orjson.dumps(tool_input).decode()
+
                     print(f"Using tool: {tool_name}")
-                    print(f"  Input: {tool_input}")
+                    print(f"  Input: {input_str}")
 
                     # Execute tool
                     result = await self.call_tool(tool_name, tool_input)
 
-                    print(f"  Result: {result.content[:200]}...")
+                    content_str = str(result.content)
+                    print(f"  Result: {_preview(result.content)}...")
                     print()
 
                     # Call callback if provided (for UI)
                     if self.tool_call_callback:
-                        self.tool_call_callback(tool_name, tool_input, str(result.content))
+                        self.tool_call_callback(tool_name, tool_input, content_str)
 
                     # Add tool result to messages
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call.id,
-                        "content": str(result.content)
+                        "content": content_str
                     })
             else:
                 # No tool calls, return the response
@@ -310,29 +498,34 @@ class DocumentAgent:
         print("=" * 60)
         print()
 
-        while True:
-            try:
-                question = input("You: ").strip()
+        try:
+            while True:
+                try:
+                    # Read input off the event loop so MCP sessions keep being serviced
+                    question = (await _ainput("You: ")).strip()
 
-                if question.lower() in ["quit", "exit", "q"]:
-                    print("Goodbye!")
-                    break
+                    if question.lower() in ["quit", "exit", "q"]:
+                        print("Goodbye!")
+                        break
 
-                if not question:
-                    continue
+                    if not question:
+                        continue
 
-                answer = await self.answer_question(question)
-                print(f"\nAgent: {answer}\n")
-                print("-" * 60)
-                print()
+                    answer = await self.answer_question(question)
+                    print(f"\nAgent: {answer}\n")
+                    print("-" * 60)
+                    print()
 
-            except KeyboardInterrupt:
-                print("\n\nGoodbye!")
-                break
-            except Exception as e:
-                print(f"\nError: {e}\n")
-                print("-" * 60)
-                print()
+                except EOFError:
+                    # Ctrl-D / closed stdin
+                    print("\nGoodbye!")
+                    break
+                except Exception as e:
+                    print(f"\nError: {e}\n")
+                    print("-" * 60)
+                    print()
+        finally:
+            await self.aclose()
 
 
 async def main():
@@ -342,4 +535,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # Ctrl-C cancels the main task (input() runs in a thread) and surfaces here
+        print("\n\nGoodbye!")
@@ -9,12 +9,11 @@ import os
 import sys
 import logging
 from pathlib import Path
+from dataclasses import dataclass, field
 from typing import Any, Optional
-from elasticsearch import Elasticsearch
-import mcp.types as types
-from mcp.server import Server
-from mcp.server.stdio import stdio_server
-from pydantic import BaseModel, Field
+import orjson
+from elasticsearch import AsyncElasticsearch
+from elastic_transport import JsonSerializer
 
 # Add parent directories to path to import config_loader
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
@@ -34,42 +33,84 @@ ELASTIC_INDEX = os.getenv("ELASTIC_INDEX", "documents")
 INFERENCE_ID = os.getenv("INFERENCE_ID", "my-embedding-model")
 
 # Initialize Elasticsearch client
-es_client: Optional[Elasticsearch] = None
+es_client: Optional[AsyncElasticsearch] = None
 
 
-class SearchResult(BaseModel):
+@dataclass(slots=True)
+class SearchResult:
     """Structured search result"""
-    title: str = Field(description="Document title")
-    filename: str = Field(description="Source filename")
-    main_text: Optional[str] = Field(default=None, description="Main document text")
-    total_pages: Optional[int] = Field(default=None, description="Total pages in document")
-    extracted_date: Optional[str] = Field(default=None, description="Document extraction date")
-    relevance_score: float = Field(description="Search relevance score")
-    images: list[dict[str, Any]] = Field(default_factory=list, description="Relevant images with descriptions")
+    title: str  # Document title
+    filename: str  # Source filename
+    relevance_score: float  # Search relevance score
+    main_text: Optional[str] = None  # Main document text
+    total_pages: Optional[int] = None  # Total pages in document
+    extracted_date: Optional[str] = None  # Document extraction date
+    images: list[dict[str, Any]] = field(default_factory=list)  # Relevant images with descriptions
 
 
-def initialize_clients():
+class ORJSONSerializer(JsonSerializer):
+    """JSON serializer for Elasticsearch request/response bodies backed by orjson"""
+
+    def dumps(self, data: Any) -> bytes:
+        if isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # Types orjson doesn't support (e.g. Decimal) use the default encoder
+            return super().dumps(data)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+async def initialize_clients():
     """Initialize Elasticsearch client"""
     global es_client
 
     if not ELASTIC_URL or not ELASTIC_API_KEY:
         raise ValueError("ELASTIC_URL and ELASTIC_API_KEY must be set in .env file")
 
-    # Initialize Elasticsearch client
-    es_client = Elasticsearch(
+    # Initialize Elasticsearch client (pooled keep-alive connections, compressed bodies)
+    es_client = AsyncElasticsearch(
         ELASTIC_URL,
         api_key=ELASTIC_API_KEY,
-        verify_certs=True
+        verify_certs=True,
+        http_compress=True,
+        connections_per_node=25,
+        request_timeout=30,
+        retry_on_timeout=True,
+        serializers={"application/json": ORJSONSerializer()}
     )
 
     # Test connection
-    if not es_client.ping():
+    if not await es_client.ping():
         raise ConnectionError("Failed to connect to Elasticsearch")
 
     logger.info(f"Connected to Elasticsearch at {ELASTIC_URL}")
     logger.info(f"Using inference endpoint: {INFERENCE_ID}")
 
 
+# Static parts of the hybrid search query, built once and shared by every request
+_IMAGE_INNER_HITS = {
+    "size": 3,
+    "_source": ["page_descriptions.page_number", "page_descriptions.description_text",
+                "page_descriptions.image_path", "page_descriptions.image_dimensions"]
+}
+# main_text is returned as a single highlight fragment instead of the full stored text
+_RESULT_SOURCE_FIELDS = ["title", "filename", "total_pages", "extracted_date", "output_directory"]
+_MAIN_TEXT_EXCERPT_CHARS = 1000
+_MAIN_TEXT_HIGHLIGHT = {
+    "fields": {
+        "main_text": {
+            "fragment_size": _MAIN_TEXT_EXCERPT_CHARS,
+            "number_of_fragments": 1,
+            "no_match_size": _MAIN_TEXT_EXCERPT_CHARS
+        }
+    }
+}
+
+
 def create_hybrid_search_query(
     question: str,
     top_k: int = 10,
@@ -81,6 +122,9 @@ def create_hybrid_search_query(
     2. Keyword search on title and main_text
     3. Vector search on image descriptions using Elasticsearch inference (nested)
 
+    Only the question-dependent nodes are built per call; static sections
+    are shared module-level constants and must not be mutated.
+
     Args:
         question: The search question
         top_k: Number of results to return
@@ -96,21 +140,9 @@ def create_hybrid_search_query(
             "bool": {
                 "should": [
                     # Semantic search on main_text (using semantic_text field)
-                    {
-                        "semantic": {
-                            "field": "main_text",
-                            "query": question
-                        }
-                    },
+                    {"semantic": {"field": "main_text", "query": question}},
                     # Keyword search on title (boosted)
-                    {
-                        "match": {
-                            "title": {
-                                "query": question,
-                                "boost": 2.0
-                            }
-                        }
-                    },
+                    {"match": {"title": {"query": question, "boost": 2.0}}},
                     # Nested kNN search on image descriptions using Elasticsearch inference
                     {
                         "nested": {
@@ -127,11 +159,7 @@ def create_hybrid_search_query(
                                     "num_candidates": 50
                                 }
                             },
-                            "inner_hits": {
-                                "size": 3,
-                                "_source": ["page_descriptions.page_number", "page_descriptions.description_text",
-                                          "page_descriptions.image_path", "page_descriptions.image_dimensions"]
-                            },
+                            "inner_hits": _IMAGE_INNER_HITS,
                             "score_mode": "max"
                         }
                     }
@@ -139,7 +167,8 @@ def create_hybrid_search_query(
                 "minimum_should_match": 1
             }
         },
-        "_source": ["title", "filename", "main_text", "total_pages", "extracted_date", "output_directory"]
+        "_source": _RESULT_SOURCE_FIELDS,
+        "highlight": _MAIN_TEXT_HIGHLIGHT
     }
 
     return query
@@ -162,21 +191,26 @@ def format_search_results(es_response: dict[str, Any]) -> list[SearchResult]:
 
         # Extract images from nested inner_hits if available
         images = []
-        if "inner_hits" in hit and "page_descriptions" in hit["inner_hits"]:
-            for inner_hit in hit["inner_hits"]["page_descriptions"]["hits"]["hits"]:
+        page_hits = hit.get("inner_hits", {}).get("page_descriptions")
+        if page_hits:
+            for inner_hit in page_hits["hits"]["hits"]:
                 img_source = inner_hit["_source"]
                 images.append({
                     "page_number": img_source.get("page_number"),
                     "description": img_source.get("description_text"),
                     "image_path": img_source.get("image_path"),
                     "dimensions": img_source.get("image_dimensions"),
-                    "score": inner_hit.get("_score", 0)
+                    "score": inner_hit.get("_score") or 0
                 })
 
+        # Text excerpt comes from the main_text highlight (truncated for brevity)
+        fragments = hit.get("highlight", {}).get("main_text")
+        main_text = fragments[0][:_MAIN_TEXT_EXCERPT_CHARS] if fragments else None
+
         result = SearchResult(
             title=source.get("title", ""),
             filename=source.get("filename", ""),
-            main_text=source.get("main_text", "")[:1000] if source.get("main_text") else None,  # Truncate for brevity
+            main_text=main_text,
             total_pages=source.get("total_pages"),
             extracted_date=source.get("extracted_date"),
             relevance_score=hit["_score"],
@@ -208,7 +242,7 @@ async def search_documents(question: str, top_k: int = 10, min_score: float = 0.
         search_query = create_hybrid_search_query(question, top_k, min_score)
 
         # Execute search
-        response = es_client.search(index=ELASTIC_INDEX, body=search_query)
+        response = await es_client.search(index=ELASTIC_INDEX, **search_query)
 
         # Format results
         results = format_search_results(response)
@@ -216,53 +250,43 @@ async def search_documents(question: str, top_k: int = 10, min_score: float = 0.
         if not results:
             return "No results found for your question."
 
-        # Format output
-        output = f"Found {len(results)} relevant documents:\n\n"
+        # Format output (collect parts and join once instead of repeated +=)
+        parts = [f"Found {len(results)} relevant documents:\n\n"]
 
         for idx, result in enumerate(results, 1):
-            output += f"## Result {idx}: {result.title}\n"
-            output += f"**Filename:** {result.filename}\n"
-            output += f"**Relevance Score:** {result.relevance_score:.2f}\n"
+            parts.append(f"## Result {idx}: {result.title}\n")
+            parts.append(f"**Filename:** {result.filename}\n")
+            parts.append(f"**Relevance Score:** {result.relevance_score:.2f}\n")
 
             if result.total_pages:
-                output += f"**Total Pages:** {result.total_pages}\n"
+                parts.append(f"**Total Pages:** {result.total_pages}\n")
 
             if result.extracted_date:
-                output += f"**Date:** {result.extracted_date}\n"
+                parts.append(f"**Date:** {result.extracted_date}\n")
 
             if result.main_text:
-                output += f"\n**Text Excerpt:**\n{result.main_text}...\n"
+                parts.append(f"\n**Text Excerpt:**\n{result.main_text}...\n")
 
             # Add image information
             if result.images:
-                output += f"\n**Relevant Images ({len(result.images)}):**\n"
+                parts.append(f"\n**Relevant Images ({len(result.images)}):**\n")
                 for img_idx, img in enumerate(result.images, 1):
-                    output += f"  {img_idx}. Page {img['page_number']}: {img['description']}\n"
-                    output += f"     Image: {img['image_path']}\n"
+                    parts.append(f"  {img_idx}. Page {img['page_number']}: {img['description']}\n")
+                    parts.append(f"     Image: {img['image_path']}\n")
                     if img.get('dimensions'):
-                        output += f"     Size: {img['dimensions']['width']}x{img['dimensions']['height']}px\n"
-                    output += f"     Relevance: {img['score']:.2f}\n"
+                        parts.append(f"     Size: {img['dimensions']['width']}x{img['dimensions']['height']}px\n")
+                    parts.append(f"     Relevance: {img['score']:.2f}\n")
 
-            output += "\n" + "-" * 80 + "\n\n"
+            parts.append("\n" + "-" * 80 + "\n\n")
 
-        return output
+        return "".join(parts)
 
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         return f"Error performing search: {str(e)}"
 
 
-# Create MCP server
-app = Server("elastic-document-search")
-
-
-@app.list_tools()
-async def list_tools() -> list[types.Tool]:
-    """List available tools"""
-    return [
-        types.Tool(
-            name="search_documents",
-            description="""Search through documents using hybrid search combining semantic understanding and keyword matching.
+SEARCH_TOOL_DESCRIPTION = """Search through documents using hybrid search combining semantic understanding and keyword matching.
 
 This tool searches across document text and image descriptions to find relevant context for answering questions.
 It uses:
@@ -270,64 +294,94 @@ It uses:
 - Keyword matching on titles for precise matches
 - Vector search on image descriptions to find relevant visual content
 
-Returns relevant text excerpts and links to images with their descriptions.""",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "question": {
-                        "type": "string",
-                        "description": "The question or search query"
-                    },
-                    "top_k": {
-                        "type": "number",
-                        "description": "Number of results to return (default: 10)",
-                        "default": 10
+Returns relevant text excerpts and links to images with their descriptions."""
+
+
+def create_server():
+    """Create the MCP server and register its tool handlers.
+
+    MCP imports are deferred to here so importing this module (e.g. to reuse
+    the search helpers) does not pay for the MCP stack.
+    """
+    import mcp.types as types
+    from mcp.server import Server
+
+    app = Server("elastic-document-search")
+
+    @app.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        """List available tools"""
+        return [
+            types.Tool(
+                name="search_documents",
+                description=SEARCH_TOOL_DESCRIPTION,
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "question": {
+                            "type": "string",
+                            "description": "The question or search query"
+                        },
+                        "top_k": {
+                            "type": "number",
+                            "description": "Number of results to return (default: 10)",
+                            "default": 10
+                        },
+                        "min_score": {
+                            "type": "number",
+                            "description": "Minimum relevance score threshold (default: 0.5)",
+                            "default": 0.5
+                        }
                     },
-                    "min_score": {
-                        "type": "number",
-                        "description": "Minimum relevance score threshold (default: 0.5)",
-                        "default": 0.5
-                    }
-                },
-                "required": ["question"]
-            }
-        )
-    ]
+                    "required": ["question"]
+                }
+            )
+        ]
 
+    @app.call_tool()
+    async def call_tool(name: str, arguments: Any) -> list[types.TextContent]:
+        """Handle tool calls"""
+        if name == "search_documents":
+            question = arguments.get("question")
+            top_k = arguments.get("top_k", 10)
+            min_score = arguments.get("min_score", 0.5)
 
-@app.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[types.TextContent]:
-    """Handle tool calls"""
-    if name == "search_documents":
-        question = arguments.get("question")
-        top_k = arguments.get("top_k", 10)
-        min_score = arguments.get("min_score", 0.5)
+            if not question:
+                return [types.TextContent(type="text", text="Error: question parameter is required")]
 
-        if not question:
-            return [types.TextContent(type="text", text="Error: question parameter is required")]
+            result = await search_documents(question, top_k, min_score)
+            return [types.TextContent(type="text", text=result)]
+        else:
+            return [types.TextContent(type="text", text=f"Unknown tool: {name}")]
 
-        result = await search_documents(question, top_k, min_score)
-        return [types.TextContent(type="text", text=result)]
-    else:
-        return [types.TextContent(type="text", text=f"Unknown tool: {name}")]
+    return app
 
 
 async def main():
     """Main entry point"""
     # Initialize clients
     try:
-        initialize_clients()
+        await initialize_clients()
     except Exception as e:
         logger.error(f"Failed to initialize: {str(e)}")
+        if es_client:
+            await es_client.close()
         raise
 
+    from mcp.server.stdio import stdio_server
+
+    app = create_server()
+
     # Run server
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        await es_client.close()
 
 
 if __name__ == "__main__":
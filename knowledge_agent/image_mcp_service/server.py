@@ -4,15 +4,26 @@ MCP Server for Image Analysis using LMStudio Vision LLM
 """
 
 import asyncio
-import base64
+import gzip
 import json
 import os
+import ssl
 import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Sequence
-from urllib.parse import urlparse
+from typing import Any, Optional, Sequence
+from urllib.parse import quote
 
+import certifi
 import httpx
+import orjson
+
+try:
+    # SIMD-accelerated base64 (libbase64); same API as the stdlib module
+    import pybase64 as base64
+except ImportError:
+    import base64
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
@@ -24,6 +35,48 @@ from config_loader import load_config
 # Load environment variables (checks local and parent directories)
 load_config()
 
+# TLS context built once per process from the certifi CA bundle
+SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+# Local images are read and base64-encoded in chunks of this size (multiple of 3)
+ENCODE_CHUNK_BYTES = 3 * 1024 * 1024
+
+
+# Tool list returned by list_tools; built once and shared (treat as read-only)
+TOOLS = (
+    Tool(
+        name="analyze_images",
+        description="Analyze one or more images using a vision LLM. Accepts a list of image file paths or URLs and a question to ask about the images.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "images": {
+                    "type": "array",
+                    "description": "List of image file paths or URLs (in order)",
+                    "items": {
+                        "type": "string"
+                    }
+                },
+                "question": {
+                    "type": "string",
+                    "description": "Question to ask about the image(s)"
+                },
+                "max_tokens": {
+                    "type": "integer",
+                    "description": "Maximum tokens in the response (default: 1000)",
+                    "default": 1000
+                },
+                "temperature": {
+                    "type": "number",
+                    "description": "Temperature for response generation (default: 0.7)",
+                    "default": 0.9
+                }
+            },
+            "required": ["images", "question"]
+        }
+    ),
+)
+
 
 class ImageAnalysisServer:
     def __init__(self):
@@ -41,6 +94,43 @@ class ImageAnalysisServer:
         self.openai_model = os.getenv("OPENAI_MODEL", "gpt-4o")
         self.openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
+        # Per-provider (display name, request URL, static headers, model), built once
+        backends = {
+            "lmstudio": (
+                "LMStudio",
+                f"{self.lmstudio_base_url}/chat/completions",
+                {"Content-Type": "application/json"},
+                self.lmstudio_model
+            ),
+            "openai": (
+                "OpenAI",
+                f"{self.openai_base_url}/chat/completions",
+                {
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.openai_api_key}"
+                },
+                self.openai_model
+            )
+        }
+
+        # Gzip request bodies (base64 image payloads compress well); the endpoint must accept it
+        self.request_gzip = os.getenv("ENABLE_REQUEST_GZIP", "false").lower() == "true"
+
+        # Optional HTTP mapping for local images: files under IMAGE_BASE_DIR are sent
+        # as IMAGE_BASE_URL/<relative path> instead of base64 data URLs
+        self.image_base_url = os.getenv("IMAGE_BASE_URL", "").rstrip("/")
+        image_base_dir = os.getenv("IMAGE_BASE_DIR", "")
+        self.image_base_dir = Path(image_base_dir).resolve() if image_base_dir else None
+
+        # Local images larger than this are rejected before encoding
+        self.max_image_bytes = int(os.getenv("MAX_IMAGE_BYTES", str(15 * 1024 * 1024)))
+
+        # Cache of encoded data URLs keyed by (path, mtime_ns, size), bounded by total size
+        self.image_cache_max_bytes = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self._encoded_cache = OrderedDict()
+        self._encoded_cache_bytes = 0
+        self._encoded_cache_lock = threading.Lock()
+
         # Common configuration
         self.default_max_tokens = int(os.getenv("DEFAULT_MAX_TOKENS", "1000"))
         self.default_temperature = float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
@@ -52,44 +142,28 @@ class ImageAnalysisServer:
         if self.provider not in ["lmstudio", "openai"]:
             raise ValueError(f"Invalid provider: {self.provider}. Must be 'lmstudio' or 'openai'")
 
+        self._backend_name, self._url, self._headers, self._model = backends[self.provider]
+
+        # Shared HTTP client so connections (and TLS sessions) are reused across calls
+        # (proxy/CA environment variables are only read when HTTP_TRUST_ENV=true)
+        self._client = httpx.AsyncClient(
+            timeout=120.0,
+            http2=True,
+            verify=SSL_CONTEXT,
+            trust_env=os.getenv("HTTP_TRUST_ENV", "false").lower() == "true",
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=30.0
+            )
+        )
+
         self._setup_handlers()
 
     def _setup_handlers(self):
         @self.server.list_tools()
         async def list_tools() -> list[Tool]:
-            return [
-                Tool(
-                    name="analyze_images",
-                    description="Analyze one or more images using a vision LLM. Accepts a list of image file paths or URLs and a question to ask about the images.",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "images": {
-                                "type": "array",
-                                "description": "List of image file paths or URLs (in order)",
-                                "items": {
-                                    "type": "string"
-                                }
-                            },
-                            "question": {
-                                "type": "string",
-                                "description": "Question to ask about the image(s)"
-                            },
-                            "max_tokens": {
-                                "type": "integer",
-                                "description": "Maximum tokens in the response (default: 1000)",
-                                "default": 1000
-                            },
-                            "temperature": {
-                                "type": "number",
-                                "description": "Temperature for response generation (default: 0.7)",
-                                "default": 0.9
-                            }
-                        },
-                        "required": ["images", "question"]
-                    }
-                )
-            ]
+            return list(TOOLS)
 
         @self.server.call_tool()
         async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
@@ -120,29 +194,71 @@ class ImageAnalysisServer:
                 return [TextContent(type="text", text=error_msg)]
 
     def _is_url(self, path: str) -> bool:
-        """Check if the path is a URL"""
-        try:
-            result = urlparse(path)
-            return all([result.scheme, result.netloc])
-        except Exception:
-            return False
+        """Check if the path is an HTTP(S) URL (the only remote images the vision APIs accept)"""
+        return path.startswith(("http://", "https://"))
+
+    def _read_exact(self, fd: int, size: int) -> bytes:
+        """Read up to size bytes, stopping short only at end of file"""
+        data = os.read(fd, size)
+        while len(data) < size:
+            more = os.read(fd, size - len(data))
+            if not more:
+                break
+            data += more
+        return data
 
     def _encode_image(self, image_path: str) -> str:
-        """Encode local image file to base64"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def _get_image_format(self, path: str) -> str:
-        """Determine image format from file extension"""
-        ext = Path(path).suffix.lower()
-        format_map = {
-            ".jpg": "jpeg",
-            ".jpeg": "jpeg",
-            ".png": "png",
-            ".gif": "gif",
-            ".webp": "webp"
-        }
-        return format_map.get(ext, "jpeg")
+        """Encode local image file as a base64 data URL
+
+        The file is read and encoded in fixed-size chunks (a multiple of 3 bytes,
+        so chunk encodings concatenate exactly) straight into one preallocated
+        buffer holding the data URL header and payload. Peak memory stays at
+        one chunk plus the output, and sequential readahead overlaps disk reads
+        with encoding.
+        """
+        try:
+            fd = os.open(image_path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+
+        try:
+            size = os.fstat(fd).st_size
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+
+            chunk = self._read_exact(fd, ENCODE_CHUNK_BYTES)
+            image_format = self._get_image_format(chunk)
+
+            header = f"data:image/{image_format};base64,".encode("ascii")
+            buf = bytearray(len(header) + 4 * ((size + 2) // 3))
+            buf[:len(header)] = header
+            pos = len(header)
+
+            while chunk:
+                encoded = base64.b64encode(chunk)
+                buf[pos:pos + len(encoded)] = encoded
+                pos += len(encoded)
+                chunk = self._read_exact(fd, ENCODE_CHUNK_BYTES)
+        finally:
+            os.close(fd)
+
+        # Trim in case the file shrank after fstat
+        del buf[pos:]
+
+        # base64 output is pure ASCII, so skip UTF-8 validation
+        return buf.decode("ascii")
+
+    def _get_image_format(self, data: bytes) -> str:
+        """Determine image format from the file's magic bytes"""
+        if data[:3] == b"\xff\xd8\xff":
+            return "jpeg"
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return "png"
+        if data[:4] == b"GIF8":
+            return "gif"
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "webp"
+        return "jpeg"
 
     async def analyze_images(
         self,
@@ -163,114 +279,126 @@ class ImageAnalysisServer:
         Returns:
             The LLM's response as a string
         """
-        if self.provider == "openai":
-            return await self._analyze_with_openai(images, question, max_tokens, temperature)
-        else:
-            return await self._analyze_with_lmstudio(images, question, max_tokens, temperature)
-
-    async def _analyze_with_lmstudio(
-        self,
-        images: list[str],
-        question: str,
-        max_tokens: int,
-        temperature: float
-    ) -> str:
-        """Analyze images using LMStudio's vision LLM"""
-        content = self._build_content(images, question)
+        content = await self._build_content(images, question)
 
         payload = {
-            "model": self.lmstudio_model,
+            "model": self._model,
             "messages": [{"role": "user", "content": content}],
             "max_tokens": max_tokens,
             "temperature": temperature
         }
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{self.lmstudio_base_url}/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
+        response = await self._post_json(self._url, payload, self._headers)
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"LMStudio API error (status {response.status_code}): {response.text}"
-                )
+        if response.status_code != 200:
+            raise Exception(
+                f"{self._backend_name} API error (status {response.status_code}): {response.text}"
+            )
 
-            result = response.json()
+        result = orjson.loads(response.content)
 
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            else:
-                raise Exception(f"Unexpected response format from LMStudio: {result}")
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        else:
+            raise Exception(f"Unexpected response format from {self._backend_name}: {result}")
+
+    async def _post_json(self, url: str, payload: dict, headers: dict) -> httpx.Response:
+        """POST a JSON payload, gzip-compressing the body when enabled"""
+        body = orjson.dumps(payload)
+        if self.request_gzip:
+            body = gzip.compress(body, compresslevel=1)
+            headers = {**headers, "Content-Encoding": "gzip"}
+        return await self._client.post(url, content=body, headers=headers)
+
+    def _served_url(self, image: str) -> Optional[str]:
+        """Return the HTTP URL for a local image under IMAGE_BASE_DIR, or None"""
+        if not self.image_base_url or self.image_base_dir is None:
+            return None
+        try:
+            relative = Path(image).resolve().relative_to(self.image_base_dir)
+        except ValueError:
+            return None
+        return f"{self.image_base_url}/{quote(relative.as_posix())}"
 
-    async def _analyze_with_openai(
-        self,
-        images: list[str],
-        question: str,
-        max_tokens: int,
-        temperature: float
-    ) -> str:
-        """Analyze images using OpenAI's vision API"""
-        content = self._build_content(images, question)
+    def _stat_image(self, image: str) -> os.stat_result:
+        """Stat a local image, rejecting missing or oversized files before any encoding"""
+        try:
+            st = os.stat(image)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Image file not found: {image}")
 
-        payload = {
-            "model": self.openai_model,
-            "messages": [{"role": "user", "content": content}],
-            "max_tokens": max_tokens,
-            "temperature": temperature
+        if st.st_size > self.max_image_bytes:
+            raise ValueError(
+                f"Image file too large: {image} ({st.st_size} bytes, limit {self.max_image_bytes})"
+            )
+        return st
+
+    def _local_image_url(self, image: str, st: os.stat_result) -> str:
+        """Read and encode a local image file (runs in a worker thread)"""
+        key = (image, st.st_mtime_ns, st.st_size)
+        data_url = self._cache_get(key)
+        if data_url is None:
+            data_url = self._encode_image(image)
+            self._cache_put(key, data_url)
+        return data_url
+
+    def _cache_get(self, key: tuple) -> Optional[str]:
+        """Look up an encoded data URL, marking it most recently used"""
+        with self._encoded_cache_lock:
+            data_url = self._encoded_cache.get(key)
+            if data_url is not None:
+                self._encoded_cache.move_to_end(key)
+            return data_url
+
+    def _cache_put(self, key: tuple, data_url: str):
+        """Store an encoded data URL, evicting least recently used entries over the byte budget"""
+        size = len(data_url)
+        if size > self.image_cache_max_bytes:
+            return
+        with self._encoded_cache_lock:
+            if key in self._encoded_cache:
+                return
+            self._encoded_cache[key] = data_url
+            self._encoded_cache_bytes += size
+            while self._encoded_cache_bytes > self.image_cache_max_bytes:
+                _, evicted = self._encoded_cache.popitem(last=False)
+                self._encoded_cache_bytes -= len(evicted)
+
+    async def _build_content(self, images: list[str], question: str) -> list[dict]:
+        """Build the content array with images and text
+
+        Local files are read and base64-encoded concurrently in worker threads
+        so the event loop isn't blocked; the original image order is kept.
+        """
+        # Preflight all local files first so a missing or oversized image fails
+        # the call before any encoding work starts, whether or not it is later
+        # served over HTTP
+        local_stats = {
+            image: self._stat_image(image)
+            for image in dict.fromkeys(image for image in images if not self._is_url(image))
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.openai_api_key}"
-        }
+        # URLs are used directly; local files are mapped to HTTP URLs when
+        # configured, otherwise encoded to base64 data URLs
+        urls = [image if self._is_url(image) else self._served_url(image) for image in images]
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{self.openai_base_url}/chat/completions",
-                json=payload,
-                headers=headers
-            )
+        # Duplicate local paths within one call are read and encoded only once
+        local = list(dict.fromkeys(image for image, url in zip(images, urls) if url is None))
+        stats = [local_stats[image] for image in local]
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"OpenAI API error (status {response.status_code}): {response.text}"
-                )
+        encoded = await asyncio.gather(*(
+            asyncio.to_thread(self._local_image_url, image, st)
+            for image, st in zip(local, stats)
+        ))
+        data_urls = dict(zip(local, encoded))
+        urls = [url if url is not None else data_urls[image] for image, url in zip(images, urls)]
 
-            result = response.json()
-
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            else:
-                raise Exception(f"Unexpected response format from OpenAI: {result}")
-
-    def _build_content(self, images: list[str], question: str) -> list[dict]:
-        """Build the content array with images and text"""
-        content = []
-
-        # Add all images to the content
-        for image in images:
-            if self._is_url(image):
-                # For URLs, use the URL directly
-                content.append({
-                    "type": "image_url",
-                    "image_url": {"url": image}
-                })
-            else:
-                # For local files, encode to base64
-                if not os.path.exists(image):
-                    raise FileNotFoundError(f"Image file not found: {image}")
-
-                base64_image = self._encode_image(image)
-                image_format = self._get_image_format(image)
-
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/{image_format};base64,{base64_image}"
-                    }
-                })
+        # Identical images share one content entry (serialized identically)
+        entries = {}
+        content = [
+            entries.setdefault(url, {"type": "image_url", "image_url": {"url": url}})
+            for url in urls
+        ]
 
         # Add the text question
         content.append({
@@ -280,14 +408,21 @@ class ImageAnalysisServer:
 
         return content
 
+    async def close(self):
+        """Close the shared HTTP client"""
+        await self._client.aclose()
+
     async def run(self):
         """Run the MCP server"""
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                self.server.create_initialization_options()
-            )
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    self.server.create_initialization_options()
+                )
+        finally:
+            await self.close()
 
 
 async def main():
@@ -296,4 +431,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        # libuv-based event loop, used when installed (not available on Windows)
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -6,21 +6,213 @@ A Gradio-based interface for easier testing and interaction with the agent.
 """
 
 import os
-import sys
 import asyncio
+import contextvars
+import functools
+import hashlib
 import json
-import pandas as pd
+import logging
+import re
+import shelve
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+import orjson
 from pathlib import Path
 import gradio as gr
 from agent import DocumentAgent
 
-# Add parent directory to path to import config_loader
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# config_loader is importable here because agent.py adds the project root to sys.path
 from config_loader import load_config
 
 # Load environment variables (checks local and parent directories)
 load_config()
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on questions answered at once when evaluation rate limiting is off
+EVAL_MAX_CONCURRENCY = int(os.getenv("EVAL_MAX_CONCURRENCY", "4"))
+
+# Maximum number of requests waiting in the Gradio queue
+UI_QUEUE_MAX_SIZE = int(os.getenv("UI_QUEUE_MAX_SIZE", "32"))
+
+# Metric LLM calls DeepEval runs at once while scoring
+EVAL_METRIC_CONCURRENCY = int(os.getenv("EVAL_METRIC_CONCURRENCY", "8"))
+
+# Search results captured for the evaluation question running in the current task
+_captured_contexts = contextvars.ContextVar("captured_contexts", default=None)
+
+# On-disk cache of DeepEval metric scores, so re-runs skip already-scored answers
+EVAL_CACHE_ENABLED = os.getenv("EVAL_CACHE_ENABLED", "true").lower() == "true"
+EVAL_CACHE_PATH = Path(os.getenv("EVAL_CACHE_PATH", "~/.cache/document_image_search/deepeval_cache")).expanduser()
+
+# Cache of chat answers for repeated questions (only used when TEMPERATURE is 0)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+
+
+def _normalize_question(question):
+    """Normalize case, whitespace and trailing punctuation so near-identical questions share a key."""
+    return " ".join(question.casefold().split()).rstrip("?!. ")
+
+
+@dataclass(frozen=True, slots=True)
+class UIConfig:
+    """Agent configuration shown in the UI, read from the environment once at startup."""
+    ai_provider: Optional[str]
+    anthropic_model: str
+    openai_model: str
+    max_tokens: str
+    temperature: str
+    elastic_search_mcp_command: str
+    elastic_search_mcp_args: str
+    image_analysis_mcp_command: str
+    image_analysis_mcp_args: str
+    system_prompt: str
+    anthropic_api_key: Optional[str] = field(default=None, repr=False)
+    openai_api_key: Optional[str] = field(default=None, repr=False)
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from environment variables (with display defaults)."""
+        return cls(
+            ai_provider=os.getenv('AI_PROVIDER'),
+            anthropic_model=os.getenv('ANTHROPIC_MODEL', 'default'),
+            openai_model=os.getenv('OPENAI_MODEL', 'default'),
+            max_tokens=os.getenv('MAX_TOKENS', '4096'),
+            temperature=os.getenv('TEMPERATURE', '0.7'),
+            elastic_search_mcp_command=os.getenv('ELASTIC_SEARCH_MCP_COMMAND', 'not set'),
+            elastic_search_mcp_args=os.getenv('ELASTIC_SEARCH_MCP_ARGS', 'not set'),
+            image_analysis_mcp_command=os.getenv('IMAGE_ANALYSIS_MCP_COMMAND', 'not set'),
+            image_analysis_mcp_args=os.getenv('IMAGE_ANALYSIS_MCP_ARGS', 'not set'),
+            system_prompt=os.getenv('SYSTEM_PROMPT', 'Using default prompt'),
+            anthropic_api_key=os.getenv('ANTHROPIC_API_KEY'),
+            openai_api_key=os.getenv('OPENAI_API_KEY'),
+        )
+
+
+CFG = UIConfig.from_env()
+
+
+def _truncate(text, limit):
+    """Shorten text to limit characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+@functools.lru_cache(maxsize=1)
+def _build_config_info(cfg):
+    """Build the configuration markdown (cached; the config is immutable)."""
+    provider = cfg.ai_provider
+
+    parts = ["## Current Configuration\n\n"]
+    parts.append(f"**AI Provider:** `{provider if provider is not None else 'not set'}`\n\n")
+
+    if (provider if provider is not None else 'anthropic') == 'anthropic':
+        parts.append(f"**Model:** `{cfg.anthropic_model}`\n")
+        parts.append(f"**API Key:** {'✓ Set' if cfg.anthropic_api_key else '✗ Not set'}\n\n")
+    else:
+        parts.append(f"**Model:** `{cfg.openai_model}`\n")
+        parts.append(f"**API Key:** {'✓ Set' if cfg.openai_api_key else '✗ Not set'}\n\n")
+
+    parts.append(f"**Max Tokens:** `{cfg.max_tokens}`\n")
+    parts.append(f"**Temperature:** `{cfg.temperature}`\n\n")
+
+    parts.append("### MCP Servers\n\n")
+    parts.append(f"**Elastic Search:**\n")
+    parts.append(f"  - Command: `{cfg.elastic_search_mcp_command}`\n")
+    parts.append(f"  - Args: `{_truncate(cfg.elastic_search_mcp_args, 60)}`\n\n")
+
+    parts.append(f"**Image Analysis:**\n")
+    parts.append(f"  - Command: `{cfg.image_analysis_mcp_command}`\n")
+    parts.append(f"  - Args: `{_truncate(cfg.image_analysis_mcp_args, 60)}`\n\n")
+
+    parts.append("### System Prompt\n\n")
+    parts.append(f"```\n{_truncate(cfg.system_prompt, 300)}\n```\n")
+
+    return "".join(parts)
+
+
+_SNAKE_CASE_RE = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+def _metric_column(class_name):
+    """Convert a metric class name to its column name, e.g. AnswerRelevancyMetric -> answer_relevancy."""
+    return _SNAKE_CASE_RE.sub('_', class_name.replace('Metric', '')).lower()
+
+
+# Paths recently found to exist, with when they were checked; hits expire so
+# deleted images drop out instead of being treated as existing for good
+_EXISTING_PATHS = {}
+EXISTING_PATH_TTL = 10.0  # seconds
+EXISTING_PATH_CACHE_SIZE = 1024
+
+
+def _path_exists(path):
+    """os.path.exists with briefly cached hits, so re-analyzed images skip the stat call."""
+    now = time.monotonic()
+    checked = _EXISTING_PATHS.get(path)
+    if checked is not None and now - checked < EXISTING_PATH_TTL:
+        return True
+
+    if not os.path.exists(path):
+        _EXISTING_PATHS.pop(path, None)
+        return False
+
+    if len(_EXISTING_PATHS) >= EXISTING_PATH_CACHE_SIZE:
+        _EXISTING_PATHS.clear()
+    _EXISTING_PATHS[path] = now
+    return True
+
+
+# Downscaled JPEG copies of analyzed images, sent to the gallery instead of full-size scans
+THUMBNAIL_DIR = Path(os.getenv("THUMBNAIL_DIR", "~/.cache/document_image_search/thumbnails")).expanduser()
+THUMBNAIL_SIZE = (512, 512)
+
+
+def _thumbnail(image_path):
+    """
+    Return a cached thumbnail for an image, creating it on first use.
+
+    Thumbnails are keyed by path, size and mtime so edited images get a fresh
+    one. Falls back to the original path if the image can't be thumbnailed,
+    and returns None if it no longer exists (or can't be stat'ed).
+    """
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        _EXISTING_PATHS.pop(image_path, None)
+        return None
+    try:
+        key = hashlib.md5(f"{image_path}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+        thumb_path = THUMBNAIL_DIR / f"{key}.jpg"
+        if not thumb_path.exists():
+            from PIL import Image
+
+            THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+            with Image.open(image_path) as im:
+                im.thumbnail(THUMBNAIL_SIZE)
+                im.convert("RGB").save(thumb_path, "JPEG", quality=80)
+        return str(thumb_path)
+    except Exception as e:
+        logger.debug("Using full-size image for %s: %s", image_path, e)
+        return image_path
+
+
+def _metric_cache_key(metric, model_name, test_case):
+    """Key a metric score by the metric, evaluation model and the scored test case."""
+    contexts = json.dumps(test_case.retrieval_context or []).encode()
+    payload = {
+        "metric": metric.__class__.__name__,
+        "model": model_name,
+        "question": test_case.input,
+        "answer": test_case.actual_output,
+        "ground_truth": test_case.expected_output,
+        "contexts": hashlib.sha256(contexts).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
 
 class AgentUI:
     """Web UI wrapper for the Document Agent."""
@@ -33,47 +225,81 @@ class AgentUI:
         self.setup_complete = False
         self.init_error = None
         self.current_images = []  # Track images used in current conversation
+        self._image_paths = set()  # Paths in current_images, for O(1) membership checks
+        self._status = None  # Status markdown, built once the agent is set
+        self.loop = None  # Event loop owning the agent's MCP sessions
+        self._loop_thread = None
+        # Normalized question -> (answer, tool_calls, images), most recently used last
+        self._answer_cache = OrderedDict()
+
+    def _start_loop(self):
+        """Start the background event loop (uvloop when installed) that owns the agent."""
+        try:
+            import uvloop
+            self.loop = uvloop.new_event_loop()
+        except ImportError:
+            self.loop = asyncio.new_event_loop()
+
+        self._loop_thread = threading.Thread(
+            target=self.loop.run_forever,
+            name="agent-event-loop",
+            daemon=True,
+        )
+        self._loop_thread.start()
+
+    def run_async(self, coro):
+        """
+        Run a coroutine on the agent's event loop and wait for the result.
+
+        The loop runs forever in a background thread and is never closed, so MCP
+        sessions and HTTP keep-alive connections persist across questions, and
+        Gradio worker threads can submit work concurrently.
+        """
+        if self.loop is None:
+            self._start_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def set_images(self, images):
+        """Replace the tracked images, keeping the path index in sync."""
+        self.current_images = list(images)
+        self._image_paths = {img["path"] for img in self.current_images}
 
     def set_agent(self, agent):
         """Set the initialized agent."""
         self.agent = agent
+        self._status = None
         self.setup_complete = True
         self.tools_loaded = True
 
         # Set up tool call callback
         def tool_callback(name, args, result):
+            # Evaluation tasks collect their search results as retrieval context
+            # and stay out of the chat's tool log and gallery
+            captured_contexts = _captured_contexts.get()
+            if captured_contexts is not None:
+                if name == "search_documents":
+                    captured_contexts.append(result)
+                return
+
             self.tool_calls.append({
                 'name': name,
-                'args': str(args),
+                'args': orjson.dumps(args).decode(),
                 'result': result
             })
 
-            # Track images that were analyzed
-            if name == "analyze_image":
-                print(f"DEBUG: analyze_image called with args type: {type(args)}, value: {args}")
-
-                # Parse args if it's a string
-                if isinstance(args, str):
-                    try:
-                        import json
-                        args = json.loads(args.replace("'", '"'))
-                    except:
-                        args = {}
-
-                if isinstance(args, dict) and "image_path" in args:
-                    image_path = args["image_path"]
-                    print(f"DEBUG: Found image_path: {image_path}, exists: {os.path.exists(image_path)}")
-
-                    if os.path.exists(image_path) and image_path not in [img["path"] for img in self.current_images]:
-                        self.current_images.append({
-                            "path": image_path,
-                            "question": args.get("question", "No specific question")
-                        })
-                        print(f"DEBUG: Added image to gallery. Total images: {len(self.current_images)}")
-                    elif image_path in [img["path"] for img in self.current_images]:
-                        print(f"DEBUG: Image already in gallery")
+            # Track images that were analyzed (the agent passes args as a parsed dict)
+            if name == "analyze_images":
+                question = args.get("question", "No specific question")
+                for image_path in args.get("images", []):
+                    if image_path in self._image_paths:
+                        logger.debug("Image already in gallery: %s", image_path)
+                    elif _path_exists(image_path):
+                        self.current_images.append({"path": image_path, "question": question})
+                        self._image_paths.add(image_path)
+                        logger.debug("Added image %s to gallery. Total images: %d", image_path, len(self.current_images))
                     else:
-                        print(f"DEBUG: Image file does not exist at path: {image_path}")
+                        # URLs and missing files aren't shown
+                        logger.debug("Image file does not exist at path: %s", image_path)
 
         self.agent.tool_call_callback = tool_callback
 
@@ -85,15 +311,20 @@ class AgentUI:
         if not self.setup_complete:
             return "⏳ Agent not initialized yet"
 
-        status = "✓ Agent initialized successfully!\n\n"
-        status += f"**Provider:** {self.agent.provider.upper()}\n"
-        status += f"**Model:** {self.agent.model}\n"
-        status += f"**Tools loaded:** {len(self.agent.tools)}\n\n"
-        status += "**Available tools:**\n"
+        # The agent's provider, model and tools are fixed once it is set
+        if self._status is not None:
+            return self._status
+
+        parts = ["✓ Agent initialized successfully!\n\n"]
+        parts.append(f"**Provider:** {self.agent.provider.upper()}\n")
+        parts.append(f"**Model:** {self.agent.model}\n")
+        parts.append(f"**Tools loaded:** {len(self.agent.tools)}\n\n")
+        parts.append("**Available tools:**\n")
         for tool in self.agent.tools:
-            status += f"  • {tool['name']} ({tool['server']})\n"
+            parts.append(f"  • {tool['name']} ({tool['server']})\n")
 
-        return status
+        self._status = "".join(parts)
+        return self._status
 
     def ask_question(self, question, history):
         """
@@ -118,18 +349,30 @@ class AgentUI:
             history.append({"role": "assistant", "content": error_msg})
             return history, self.format_tool_calls(), self.get_images_gallery()
 
+        # Repeated questions are answered from the cache (deterministic agents only)
+        use_cache = ANSWER_CACHE_ENABLED and self.agent.temperature == 0
+        cache_key = _normalize_question(question)
+        if use_cache and cache_key in self._answer_cache:
+            self._answer_cache.move_to_end(cache_key)
+            response, tool_calls, images = self._answer_cache[cache_key]
+            self.tool_calls = list(tool_calls)
+            self.set_images(images)
+            history.append({"role": "user", "content": question})
+            history.append({"role": "assistant", "content": response})
+            return history, self.format_tool_calls(), self.get_images_gallery()
+
         # Clear previous tool calls and images for this question
         self.tool_calls = []
-        self.current_images = []
+        self.set_images([])
 
         try:
-            # Run async question in new event loop
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                response = loop.run_until_complete(self.agent.answer_question(question))
-            finally:
-                loop.close()
+            # Run async question on the agent's event loop
+            response = self.run_async(self.agent.answer_question(question))
+
+            if use_cache:
+                self._answer_cache[cache_key] = (response, list(self.tool_calls), list(self.current_images))
+                if len(self._answer_cache) > ANSWER_CACHE_SIZE:
+                    self._answer_cache.popitem(last=False)
 
             # Add to history as message dicts
             history.append({"role": "user", "content": question})
@@ -148,67 +391,35 @@ class AgentUI:
         if not self.tool_calls:
             return "No tool calls yet. Ask a question to see tool usage."
 
-        formatted = "## Tool Calls\n\n"
+        parts = ["## Tool Calls\n\n"]
         for i, call in enumerate(self.tool_calls, 1):
-            formatted += f"### {i}. {call['name']}\n\n"
-            formatted += f"**Arguments:**\n```json\n{call['args']}\n```\n\n"
+            parts.append(f"### {i}. {call['name']}\n\n")
+            parts.append(f"**Arguments:**\n```json\n{call['args']}\n```\n\n")
             result_preview = call['result'][:300] + "..." if len(call['result']) > 300 else call['result']
-            formatted += f"**Result:**\n```\n{result_preview}\n```\n\n"
-            formatted += "---\n\n"
+            parts.append(f"**Result:**\n```\n{result_preview}\n```\n\n")
+            parts.append("---\n\n")
 
         # Add image tracking info
         if self.current_images:
-            formatted += f"\n**Images tracked:** {len(self.current_images)}\n"
+            parts.append(f"\n**Images tracked:** {len(self.current_images)}\n")
             for img in self.current_images:
-                formatted += f"  • {img['path']}\n"
+                parts.append(f"  • {img['path']}\n")
 
-        return formatted
+        return "".join(parts)
 
     def get_images_gallery(self):
         """Get list of image paths for gallery display."""
         if not self.current_images:
-            print("DEBUG: No images to display")
             return []
 
-        image_paths = [img["path"] for img in self.current_images]
-        print(f"DEBUG: Returning {len(image_paths)} images for gallery: {image_paths}")
+        # Thumbnailing stats each image, so images deleted since they were tracked are dropped
+        image_paths = [thumb for img in self.current_images if (thumb := _thumbnail(img["path"])) is not None]
+        logger.debug("Returning %d images for gallery: %s", len(image_paths), image_paths)
         return image_paths
 
     def get_config_info(self):
         """Get current configuration information."""
-        config = "## Current Configuration\n\n"
-        config += f"**AI Provider:** `{os.getenv('AI_PROVIDER', 'not set')}`\n\n"
-
-        if os.getenv('AI_PROVIDER', 'anthropic') == 'anthropic':
-            config += f"**Model:** `{os.getenv('ANTHROPIC_MODEL', 'default')}`\n"
-            config += f"**API Key:** {'✓ Set' if os.getenv('ANTHROPIC_API_KEY') else '✗ Not set'}\n\n"
-        else:
-            config += f"**Model:** `{os.getenv('OPENAI_MODEL', 'default')}`\n"
-            config += f"**API Key:** {'✓ Set' if os.getenv('OPENAI_API_KEY') else '✗ Not set'}\n\n"
-
-        config += f"**Max Tokens:** `{os.getenv('MAX_TOKENS', '4096')}`\n"
-        config += f"**Temperature:** `{os.getenv('TEMPERATURE', '0.7')}`\n\n"
-
-        config += "### MCP Servers\n\n"
-        config += f"**Elastic Search:**\n"
-        config += f"  - Command: `{os.getenv('ELASTIC_SEARCH_MCP_COMMAND', 'not set')}`\n"
-        elastic_args = os.getenv('ELASTIC_SEARCH_MCP_ARGS', 'not set')
-        if len(elastic_args) > 60:
-            elastic_args = elastic_args[:60] + "..."
-        config += f"  - Args: `{elastic_args}`\n\n"
-
-        config += f"**Image Analysis:**\n"
-        config += f"  - Command: `{os.getenv('IMAGE_ANALYSIS_MCP_COMMAND', 'not set')}`\n"
-        image_args = os.getenv('IMAGE_ANALYSIS_MCP_ARGS', 'not set')
-        if len(image_args) > 60:
-            image_args = image_args[:60] + "..."
-        config += f"  - Args: `{image_args}`\n\n"
-
-        config += "### System Prompt\n\n"
-        prompt = os.getenv('SYSTEM_PROMPT', 'Using default prompt')
-        config += f"```\n{prompt[:300]}{'...' if len(prompt) > 300 else ''}\n```\n"
-
-        return config
+        return _build_config_info(CFG)
 
     def run_evaluation(self, questions_file, tokens_per_minute=30000, delay_between_questions=10.0, enable_rate_limiting=True, eval_provider="openai", eval_model=None, progress=gr.Progress()):
         """
@@ -236,7 +447,7 @@ class AgentUI:
             class CustomEvaluationModel(DeepEvalBaseLLM):
                 def __init__(self, provider, model):
                     self.provider = provider.lower()
-                    self.api_key = os.getenv(f"{provider.upper()}_API_KEY")
+                    self.api_key = getattr(CFG, f"{self.provider}_api_key", None)
 
                     if self.provider == "openai":
                         from openai import OpenAI
@@ -268,7 +479,8 @@ class AgentUI:
                         return response.content[0].text
 
                 async def a_generate(self, prompt):
-                    return self.generate(prompt)
+                    # Run the blocking SDK call in a thread so concurrent metrics overlap
+                    return await asyncio.to_thread(self.generate, prompt)
 
                 def get_model_name(self):
                     return self.model_name
@@ -280,55 +492,60 @@ class AgentUI:
                 progress(0, desc=f"Using {eval_model} for evaluation...")
 
             # Token rate limiter setup
-            class TokenRateLimiter:
+            class AsyncTokenBucket:
                 def __init__(self, tokens_per_minute, delay_between_questions):
                     self.tokens_per_minute = tokens_per_minute
                     self.delay_between_questions = delay_between_questions
                     self.tokens_used = 0
-                    self.window_start = time.time()
+                    self.window_start = time.monotonic()
                     self.last_request_time = 0
                     # DeepEval uses ~4 metric evaluations per question
                     self.estimated_tokens_per_eval = 11000
+                    # Serializes grants across concurrent evaluation tasks
+                    self._lock = asyncio.Lock()
 
                 def estimate_tokens(self, text):
                     return len(text) // 4
 
-                def wait_if_needed(self, estimated_tokens=None):
-                    if estimated_tokens is None:
-                        estimated_tokens = self.estimated_tokens_per_eval
-
-                    current_time = time.time()
-
-                    # Enforce minimum delay between questions
-                    if self.last_request_time > 0:
-                        time_since_last = current_time - self.last_request_time
-                        if time_since_last < self.delay_between_questions:
-                            delay_needed = self.delay_between_questions - time_since_last
-                            progress(0, desc=f"⏳ Delay between questions ({delay_needed:.1f}s)...")
-                            time.sleep(delay_needed)
-                            current_time = time.time()
-
-                    # Token-based rate limiting
-                    elapsed = current_time - self.window_start
-
-                    if elapsed >= 60:
-                        self.tokens_used = 0
-                        self.window_start = current_time
-                    else:
-                        if self.tokens_used + estimated_tokens > self.tokens_per_minute:
-                            wait_time = 60 - elapsed
-                            if wait_time > 0:
-                                progress(0, desc=f"⏳ Token limit - waiting {wait_time:.0f}s...")
-                                time.sleep(wait_time)
-                                self.tokens_used = 0
-                                self.window_start = time.time()
-
-                    self.tokens_used += estimated_tokens
-                    self.last_request_time = time.time()
-
-            rate_limiter = TokenRateLimiter(tokens_per_minute, delay_between_questions) if enable_rate_limiting else None
+                async def acquire(self, estimated_tokens=None):
+                    """Wait until the next question may start, yielding to the event loop."""
+                    async with self._lock:
+                        if estimated_tokens is None:
+                            estimated_tokens = self.estimated_tokens_per_eval
+
+                        current_time = time.monotonic()
+
+                        # Enforce minimum delay between questions
+                        if self.last_request_time > 0:
+                            time_since_last = current_time - self.last_request_time
+                            if time_since_last < self.delay_between_questions:
+                                delay_needed = self.delay_between_questions - time_since_last
+                                progress(0, desc=f"⏳ Delay between questions ({delay_needed:.1f}s)...")
+                                await asyncio.sleep(delay_needed)
+                                current_time = time.monotonic()
+
+                        # Token-based rate limiting
+                        elapsed = current_time - self.window_start
+
+                        if elapsed >= 60:
+                            self.tokens_used = 0
+                            self.window_start = current_time
+                        else:
+                            if self.tokens_used + estimated_tokens > self.tokens_per_minute:
+                                wait_time = 60 - elapsed
+                                if wait_time > 0:
+                                    progress(0, desc=f"⏳ Token limit - waiting {wait_time:.0f}s...")
+                                    await asyncio.sleep(wait_time)
+                                    self.tokens_used = 0
+                                    self.window_start = time.monotonic()
+
+                        self.tokens_used += estimated_tokens
+                        self.last_request_time = time.monotonic()
+
+            rate_limiter = AsyncTokenBucket(tokens_per_minute, delay_between_questions) if enable_rate_limiting else None
             # Import evaluation dependencies
             from deepeval import evaluate
+            from deepeval.evaluate import AsyncConfig, DisplayConfig
             from deepeval.metrics import (
                 AnswerRelevancyMetric,
                 FaithfulnessMetric,
@@ -340,95 +557,79 @@ class AgentUI:
             # Read questions file
             if isinstance(questions_file, str):
                 # File path provided
-                with open(questions_file, 'r') as f:
-                    questions = json.load(f)
-            else:
+                questions = orjson.loads(Path(questions_file).read_bytes())
+            elif hasattr(questions_file, 'read'):
                 # File object from Gradio upload
-                questions = json.load(questions_file)
+                questions = orjson.loads(questions_file.read())
+            else:
+                # Gradio temp file wrapper
+                questions = orjson.loads(Path(questions_file.name).read_bytes())
 
             progress(0, desc="Starting evaluation...")
 
-            # Prepare test cases
-            test_cases = []
-            questions_data = []
+            # Questions are independent, so answer them concurrently on the agent's
+            # loop; keep within the token budget when rate limiting is enabled
+            if rate_limiter:
+                concurrency = max(1, tokens_per_minute // rate_limiter.estimated_tokens_per_eval // 2)
+            else:
+                concurrency = EVAL_MAX_CONCURRENCY
 
-            # Process each question
             total = len(questions)
-            for i, q in enumerate(questions):
-                progress((i / total), desc=f"Processing question {i+1}/{total}...")
-
-                # Apply rate limiting
-                if rate_limiter:
-                    estimated = rate_limiter.estimate_tokens(
-                        q['question'] + q.get('ground_truth', '')
-                    )
-                    rate_limiter.wait_if_needed(estimated)
-
-                # Clear tool calls for this question
-                self.tool_calls = []
-                captured_contexts = []
-
-                # Set up context capture
-                original_callback = self.agent.tool_call_callback
-
-                def capture_context(name, args, result):
-                    # Call original callback
-                    if original_callback:
-                        original_callback(name, args, result)
-                    # Capture contexts
-                    if name == "search_documents":
-                        captured_contexts.append(result)
-
-                self.agent.tool_call_callback = capture_context
+            completed = 0
+
+            async def process_one(q, sem):
+                nonlocal completed
+                async with sem:
+                    # Apply rate limiting
+                    if rate_limiter:
+                        estimated = rate_limiter.estimate_tokens(
+                            q['question'] + q.get('ground_truth', '')
+                        )
+                        await rate_limiter.acquire(estimated)
 
-                try:
-                    # Run async question
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
+                    # Each task captures its own search contexts
+                    token = _captured_contexts.set([])
                     try:
-                        answer = loop.run_until_complete(
-                            self.agent.answer_question(q['question'])
-                        )
+                        answer = await self.agent.answer_question(q['question'])
+                        captured_contexts = _captured_contexts.get()
+                        # Use captured contexts or fallback to provided contexts
+                        retrieval_context = captured_contexts if captured_contexts else q.get('contexts', [])
+                    except Exception as e:
+                        answer = f"Error: {str(e)}"
+                        retrieval_context = q.get('contexts', [])
                     finally:
-                        loop.close()
+                        _captured_contexts.reset(token)
 
-                    # Use captured contexts or fallback to provided contexts
-                    retrieval_context = captured_contexts if captured_contexts else q.get('contexts', [])
+                completed += 1
+                progress(completed / total, desc=f"Processed question {completed}/{total}...")
+                return q, answer, retrieval_context
 
-                    # Create DeepEval test case
-                    test_case = LLMTestCase(
-                        input=q['question'],
-                        actual_output=answer,
-                        expected_output=q['ground_truth'],
-                        retrieval_context=retrieval_context
-                    )
+            async def process_all():
+                sem = asyncio.Semaphore(concurrency)
+                return await asyncio.gather(*[process_one(q, sem) for q in questions])
 
-                    test_cases.append(test_case)
-                    questions_data.append({
-                        'question': q['question'],
-                        'answer': answer,
-                        'contexts': retrieval_context,
-                        'ground_truth': q['ground_truth']
-                    })
-
-                except Exception as e:
-                    # Add error entry
-                    test_case = LLMTestCase(
-                        input=q['question'],
-                        actual_output=f"Error: {str(e)}",
-                        expected_output=q['ground_truth'],
-                        retrieval_context=q.get('contexts', [])
-                    )
-                    test_cases.append(test_case)
-                    questions_data.append({
-                        'question': q['question'],
-                        'answer': f"Error: {str(e)}",
-                        'contexts': q.get('contexts', []),
-                        'ground_truth': q['ground_truth']
-                    })
+            answered = self.run_async(process_all())
 
-                # Restore original callback
-                self.agent.tool_call_callback = original_callback
+            # Prepare test cases
+            test_cases = []
+            questions_data = []
+
+            for q, answer, retrieval_context in answered:
+                # Create DeepEval test case
+                test_case = LLMTestCase(
+                    input=q['question'],
+                    actual_output=answer,
+                    expected_output=q['ground_truth'],
+                    retrieval_context=retrieval_context
+                )
+
+                test_cases.append(test_case)
+                questions_data.append({
+                    'question': q['question'],
+                    'answer': answer,
+                    'contexts': retrieval_context,
+                    'ground_truth': q['ground_truth']
+                })
 
             progress(0.8, desc="Running DeepEval evaluation...")
 
@@ -444,13 +645,61 @@ class AgentUI:
                 ContextualRecallMetric(**metric_kwargs),
             ]
 
-            # Evaluate with deepeval
-            evaluate(test_cases=test_cases, metrics=metrics)
+            # Scores per test case keyed by metric class name; cached scores are
+            # reused and only test cases missing a score are sent to deepeval
+            model_name = evaluation_model.get_model_name() if evaluation_model else "default"
+            scores = [{} for _ in test_cases]
+
+            if EVAL_CACHE_ENABLED:
+                EVAL_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                eval_cache = shelve.open(str(EVAL_CACHE_PATH))
+            else:
+                eval_cache = {}
+
+            try:
+                pending = []
+                for i, test_case in enumerate(test_cases):
+                    for metric in metrics:
+                        key = _metric_cache_key(metric, model_name, test_case)
+                        if key in eval_cache:
+                            scores[i][metric.__class__.__name__] = eval_cache[key]
+                    if len(scores[i]) < len(metrics):
+                        pending.append(i)
+
+                if pending:
+                    progress(0.8, desc=f"Scoring {len(pending)}/{len(test_cases)} answers with DeepEval...")
+
+                    # Evaluate with deepeval, scoring all test cases and metrics concurrently
+                    evaluation = evaluate(
+                        test_cases=[test_cases[i] for i in pending],
+                        metrics=metrics,
+                        async_config=AsyncConfig(run_async=True, max_concurrent=EVAL_METRIC_CONCURRENCY),
+                        display_config=DisplayConfig(show_indicator=False, print_results=False),
+                    )
+
+                    metrics_by_name = {metric.__name__: metric for metric in metrics}
+                    results_by_case = {
+                        (result.input, result.actual_output): result
+                        for result in evaluation.test_results
+                    }
+                    for i in pending:
+                        test_case = test_cases[i]
+                        result = results_by_case.get((test_case.input, test_case.actual_output))
+                        if result is None:
+                            continue
+                        for metric_data in result.metrics_data or []:
+                            metric = metrics_by_name.get(metric_data.name)
+                            if metric is None or metric_data.score is None:
+                                continue
+                            scores[i][metric.__class__.__name__] = metric_data.score
+                            eval_cache[_metric_cache_key(metric, model_name, test_case)] = metric_data.score
+            finally:
+                if EVAL_CACHE_ENABLED:
+                    eval_cache.close()
 
             progress(1.0, desc="Evaluation complete!")
 
-            # Extract scores and create dataframe
-            results_data = []
+            # Extract scores into preallocated columns and create dataframe
             metric_scores = {
                 'answer_relevancy': [],
                 'faithfulness': [],
@@ -458,50 +707,53 @@ class AgentUI:
                 'contextual_recall': []
             }
 
-            for i, test_case in enumerate(test_cases):
-                row = {'question': questions_data[i]['question'][:50] + '...'}
+            # (class name, snake_case column name) per metric, computed once
+            metric_names = [
+                (metric.__class__.__name__, _metric_column(metric.__class__.__name__))
+                for metric in metrics
+            ]
 
-                # Extract metric scores
-                for metric in metrics:
-                    metric_name = metric.__class__.__name__.replace('Metric', '').lower()
-                    # Convert camelCase to snake_case
-                    metric_name = ''.join(['_'+c.lower() if c.isupper() else c for c in metric_name]).lstrip('_')
+            total = len(test_cases)
+            results_data = {'question': [data['question'][:50] + '...' for data in questions_data]}
+            for _, metric_name in metric_names:
+                results_data[metric_name] = [0.0] * total
 
-                    # Try to get score from test case
-                    score = getattr(test_case, f"{metric.__class__.__name__.replace('Metric', '').lower()}_score", None)
+            for i in range(total):
+                # Extract metric scores
+                for class_name, metric_name in metric_names:
+                    # Score from the cache or this run's deepeval results
+                    score = scores[i].get(class_name)
                     if score is not None:
-                        row[metric_name] = score
+                        results_data[metric_name][i] = score
                         if metric_name in metric_scores:
                             metric_scores[metric_name].append(score)
-                    else:
-                        row[metric_name] = 0.0
 
-                results_data.append(row)
+            # pandas is only needed for the results table, so load it on first evaluation
+            import pandas as pd
 
             results_df = pd.DataFrame(results_data)
 
             # Create summary
-            summary = "## 📊 Evaluation Summary\n\n"
-            summary += f"**Total Questions Evaluated:** {len(questions)}\n\n"
-            summary += "### Average Scores\n\n"
+            summary_parts = ["## 📊 Evaluation Summary\n\n"]
+            summary_parts.append(f"**Total Questions Evaluated:** {len(questions)}\n\n")
+            summary_parts.append("### Average Scores\n\n")
 
             for metric_name, scores in metric_scores.items():
                 if scores:
                     avg_score = sum(scores) / len(scores)
-                    summary += f"- **{metric_name.replace('_', ' ').title()}:** {avg_score:.3f}\n"
+                    summary_parts.append(f"- **{metric_name.replace('_', ' ').title()}:** {avg_score:.3f}\n")
 
             # Create detailed results
-            detailed = "## 📝 Detailed Results\n\n"
+            detailed_parts = ["## 📝 Detailed Results\n\n"]
             for i, data in enumerate(questions_data):
-                detailed += f"### Question {i+1}\n"
-                detailed += f"**Q:** {data['question'][:100]}...\n\n"
+                detailed_parts.append(f"### Question {i+1}\n")
+                detailed_parts.append(f"**Q:** {data['question'][:100]}...\n\n")
                 for metric_name in metric_scores.keys():
-                    if i < len(results_data) and metric_name in results_data[i]:
-                        score = results_data[i][metric_name]
-                        detailed += f"- {metric_name}: {score:.3f}\n"
-                detailed += "\n---\n\n"
+                    if metric_name in results_data:
+                        detailed_parts.append(f"- {metric_name}: {results_data[metric_name][i]:.3f}\n")
+                detailed_parts.append("\n---\n\n")
 
-            return results_df, summary, detailed
+            return results_df, "".join(summary_parts), "".join(detailed_parts)
 
         except Exception as e:
             import traceback
@@ -554,6 +806,9 @@ def create_ui():
             with gr.Tab("📊 Evaluation"):
                 create_evaluation_tab()
 
+    # Queue requests so a slow question or evaluation doesn't block other events
+    demo.queue(max_size=UI_QUEUE_MAX_SIZE)
+
     return demo
 
 
@@ -618,20 +873,30 @@ def create_chat_tab():
                 )
 
     # Event handlers
-    def submit_question(question, history):
-        """Handle question submission."""
+    async def submit_question(question, history):
+        """Handle question submission, showing the question before the answer arrives."""
         if not question.strip():
-            return history, "No tool calls yet.", []
+            yield history, "No tool calls yet.", []
+            return
 
-        # Process question
-        updated_history, tool_calls, images = ui_instance.ask_question(question, history)
+        pending = history + [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": "⏳ Thinking..."},
+        ]
+        yield pending, "Running tools...", []
 
-        return updated_history, tool_calls, images
+        # ask_question blocks on the agent's loop, so keep it off Gradio's loop
+        updated_history, tool_calls, images = await asyncio.to_thread(ui_instance.ask_question, question, history)
 
+        yield updated_history, tool_calls, images
+
+    # Both triggers share one queue slot: the tool log and gallery are per-UI state
     submit_btn.click(
         fn=submit_question,
         inputs=[question_input, chatbot],
         outputs=[chatbot, tool_calls_display, image_gallery],
+        concurrency_limit=1,
+        concurrency_id="chat",
     ).then(
         fn=lambda: "",
         outputs=question_input,
@@ -641,13 +906,15 @@ def create_chat_tab():
         fn=submit_question,
         inputs=[question_input, chatbot],
         outputs=[chatbot, tool_calls_display, image_gallery],
+        concurrency_limit=1,
+        concurrency_id="chat",
     ).then(
         fn=lambda: "",
         outputs=question_input,
     )
 
     def clear_history():
-        ui_instance.current_images = []
+        ui_instance.set_images([])
         return [], "No tool calls yet.", []
 
     clear_btn.click(
@@ -773,13 +1040,8 @@ def create_evaluation_tab():
         )
 
         if results_df is not None:
-            # Format dataframe for display
-            display_df = results_df.copy()
-            # Round numeric columns
-            for col in display_df.select_dtypes(include=['float64']).columns:
-                display_df[col] = display_df[col].round(3)
-
-            return summary, detailed, display_df
+            # Format dataframe for display (round rounds only the numeric columns)
+            return summary, detailed, results_df.round(3)
         else:
             # Error case
             return summary, detailed, None
@@ -793,18 +1055,17 @@ def create_evaluation_tab():
 
 def main():
     """Main entry point."""
+    # Debug output (tool callbacks, gallery updates) is opt-in via LOG_LEVEL=DEBUG
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
     print("=" * 60)
     print("Starting Document Q&A Agent UI...")
     print("=" * 60)
     print()
 
-    # Initialize agent in main thread before starting UI
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        success = loop.run_until_complete(initialize_agent_async())
-    finally:
-        loop.close()
+    # Initialize agent in main thread before starting UI; the loop stays open
+    # so the MCP sessions opened here can be reused for every question
+    success = ui_instance.run_async(initialize_agent_async())
 
     if not success:
         print("\n⚠️  Agent initialization failed, but starting UI anyway.")
@@ -815,12 +1076,19 @@ def main():
     demo = create_ui()
 
     # Launch configuration
-    demo.launch(
-        server_name="0.0.0.0",
-        server_port=7860,
-        share=False,
-        show_error=True,
-    )
+    try:
+        demo.launch(
+            server_name="0.0.0.0",
+            server_port=7860,
+            share=False,
+            show_error=True,
+            # Thumbnails live outside the working and temp directories Gradio serves by default
+            allowed_paths=[str(THUMBNAIL_DIR)],
+        )
+    finally:
+        # Stop the MCP server processes on the loop that owns their sessions
+        if ui_instance.agent is not None:
+            ui_instance.run_async(ui_instance.agent.aclose())
 
 
 if __name__ == "__main__":
@@ -6,12 +6,22 @@ Can accept either a PDF file (will extract first) or an extracted directory.
 """
 
 import sys
-import json
+import hashlib
+import io
+import logging
 import os
-import subprocess
+import re
+import shelve
+import struct
+import threading
+from collections import deque
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from elasticsearch import Elasticsearch
+import orjson
+from elasticsearch import ApiError, Elasticsearch, TransportError, helpers
+from elastic_transport import JsonSerializer
 from PIL import Image
 import requests
 
@@ -22,14 +32,172 @@ from config_loader import load_config
 # Load environment variables (checks local and parent directories)
 load_config()
 
+logger = logging.getLogger(__name__)
 
-def extract_pdf(pdf_path, output_dir=None):
+# Extraction runs in-process (pdf_extractor.py sits next to this script)
+sys.path.insert(0, str(Path(__file__).parent))
+import pdf_extractor
+
+# Bulk indexing: documents per _bulk request and concurrent requests. Each
+# document carries its full text plus every page's embedding work, so chunks
+# are kept small.
+BULK_CHUNK_SIZE = int(os.getenv("ELASTICSEARCH_BULK_CHUNK_SIZE", "10"))
+BULK_THREAD_COUNT = int(os.getenv("ELASTICSEARCH_BULK_THREADS", "4"))
+
+INFERENCE_ID = os.getenv("ELASTICSEARCH_INFERENCE_ID", "my_e5_model")
+
+# Page description embeddings keyed by content hash, so unchanged pages skip
+# inference when a PDF is re-ingested
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", "~/.cache/document_image_search/embeddings")).expanduser()
+
+
+# Batch size for client-side embedding requests
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# The cache is read while documents are built and written from the indexing thread
+_embedding_cache_lock = threading.Lock()
+
+
+def _embedding_key(text):
+    return hashlib.sha256(f"{INFERENCE_ID}\n{text}".encode("utf-8")).hexdigest()
+
+
+def content_sha(main_text, page_descriptions):
+    """Hash of the inference inputs (main text and page captions) of a document."""
+    digest = hashlib.sha256(main_text.encode("utf-8"))
+    for page_desc in page_descriptions:
+        digest.update(f"\0{page_desc['page_number']}\0{page_desc['description_text']}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def find_indexed_duplicates(es, index_name, shas):
+    """
+    Look up already indexed documents by content hash.
+
+    Returns:
+        Dict mapping content_sha to the ID of an indexed document with that content
+    """
+    if not shas:
+        return {}
+
+    try:
+        response = es.search(
+            index=index_name,
+            query={"terms": {"content_sha": list(shas)}},
+            source=["content_sha"],
+            size=len(shas),
+            collapse={"field": "content_sha"},
+        )
+    except Exception as e:
+        print(f"  Warning: Could not check for already indexed documents: {e}")
+        return {}
+
+    return {hit["_source"]["content_sha"]: hit["_id"] for hit in response["hits"]["hits"]}
+
+
+def apply_cached_embeddings(page_descriptions):
+    """
+    Fill description_vector from the embedding cache where available.
+
+    Pages with a vector are skipped by the ingest pipeline's inference step.
+
+    Returns:
+        Number of pages that reused a cached embedding
+    """
+    if not EMBEDDING_CACHE_ENABLED or not page_descriptions:
+        return 0
+
+    hits = 0
+    EMBEDDING_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with _embedding_cache_lock, shelve.open(str(EMBEDDING_CACHE_PATH)) as cache:
+        for page_desc in page_descriptions:
+            vector = cache.get(_embedding_key(page_desc["description_text"]))
+            if vector is not None:
+                page_desc["description_vector"] = vector
+                hits += 1
+    return hits
+
+
+def cache_indexed_embeddings(es, index_name, doc_ids):
+    """Store the embeddings the ingest pipeline generated for the given documents."""
+    if not EMBEDDING_CACHE_ENABLED or not doc_ids:
+        return
+
+    try:
+        response = es.mget(
+            index=index_name,
+            ids=doc_ids,
+            source_includes=["page_descriptions.description_text", "page_descriptions.description_vector"],
+        )
+    except Exception as e:
+        print(f"  Warning: Could not read back embeddings for caching: {e}")
+        return
+
+    _store_embeddings(
+        (page_desc["description_text"], page_desc["description_vector"])
+        for doc in response["docs"]
+        for page_desc in doc.get("_source", {}).get("page_descriptions", [])
+        if page_desc.get("description_vector") is not None
+    )
+
+
+def _store_embeddings(items):
+    """Write (description_text, vector) pairs to the embedding cache."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return
+
+    EMBEDDING_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with _embedding_cache_lock, shelve.open(str(EMBEDDING_CACHE_PATH)) as cache:
+        for text, vector in items:
+            cache[_embedding_key(text)] = vector
+
+
+def embed_page_descriptions(es, page_descriptions):
     """
-    Extract PDF using pdf_extractor.py script.
+    Compute description_vector client-side for pages that don't have one.
+
+    Distinct description texts are sent to the inference endpoint in batches
+    of EMBEDDING_BATCH_SIZE, one request per batch instead of one inference
+    per page in the ingest pipeline. Pages left without a vector (e.g. the
+    endpoint is unavailable) are still embedded by the pipeline.
+
+    Returns:
+        Number of pages that received a vector
+    """
+    missing = [page_desc for page_desc in page_descriptions if "description_vector" not in page_desc]
+    texts = list(dict.fromkeys(page_desc["description_text"] for page_desc in missing))
+    if not texts:
+        return 0
+
+    vectors = {}
+    try:
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            response = es.inference.inference(inference_id=INFERENCE_ID, input=batch)
+            for text, result in zip(batch, response["text_embedding"]):
+                vectors[text] = result["embedding"]
+    except Exception as e:
+        print(f"  Warning: Client-side embedding failed, falling back to the ingest pipeline: {e}")
+
+    for page_desc in missing:
+        vector = vectors.get(page_desc["description_text"])
+        if vector is not None:
+            page_desc["description_vector"] = vector
+
+    _store_embeddings(vectors.items())
+    return sum(1 for page_desc in missing if "description_vector" in page_desc)
+
+
+def extract_pdf(pdf_path, output_dir=None, reuse_existing=None):
+    """
+    Extract PDF using pdf_extractor (in-process, no interpreter per PDF).
 
     Args:
         pdf_path: Path to the PDF file
         output_dir: Optional output directory (auto-generated if not provided)
+        reuse_existing: Whether to reuse an existing extraction directory
+            (None asks interactively)
 
     Returns:
         Path to extraction directory if successful, None otherwise
@@ -53,31 +221,24 @@ def extract_pdf(pdf_path, output_dir=None):
     # Check if already extracted
     if output_path.exists():
         print(f"Note: Directory '{output_dir}' already exists")
-        response = input("Use existing extraction? (yes/no): ")
-        if response.lower() == 'yes':
+        if reuse_existing is None:
+            reuse_existing = _ask_reuse_extraction()
+        if reuse_existing:
             return str(output_path)
 
     print(f"\nExtracting PDF: {pdf_path}")
     print(f"Output directory: {output_dir}")
 
-    # Get the directory where this script is located
-    script_dir = Path(__file__).parent
-    extractor_script = script_dir / "pdf_extractor.py"
-
-    if not extractor_script.exists():
-        print(f"Error: pdf_extractor.py not found at {extractor_script}")
-        return None
-
-    # Run pdf_extractor.py
+    # Run the extractor, collecting its output so parallel extractions don't interleave
+    output = io.StringIO()
     try:
-        cmd = [sys.executable, str(extractor_script), str(pdf_path), str(output_dir)]
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        output_path.mkdir(parents=True, exist_ok=True)
+        with redirect_stdout(output):
+            # Reaching here means the existing directory is not being reused
+            pdf_extractor.process_single_pdf(str(pdf_path), str(output_path), force=True)
 
         # Print output from extractor
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
+        print(output.getvalue())
 
         # Verify extraction was successful
         if not output_path.exists():
@@ -87,18 +248,55 @@ def extract_pdf(pdf_path, output_dir=None):
         print(f"✓ PDF extraction complete!")
         return str(output_path)
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error running pdf_extractor.py: {e}")
-        if e.stdout:
-            print(e.stdout)
-        if e.stderr:
-            print(e.stderr, file=sys.stderr)
+    except SystemExit as e:
+        # The extractor exits on unrecoverable errors
+        print(output.getvalue())
+        print(f"Error running pdf_extractor: exited with status {e.code}")
         return None
     except Exception as e:
         print(f"Error: {e}")
         return None
 
 
+# --reuse-extraction values; None means ask
+_REUSE_CHOICES = {"yes": True, "no": False, "ask": None}
+
+
+def _ask_reuse_extraction():
+    if not sys.stdin.isatty():
+        # Nobody to ask (e.g. piped or scheduled runs): keep the existing extraction
+        print("Non-interactive session, using existing extraction")
+        return True
+    response = input("Use existing extraction? (yes/no): ")
+    return response.lower() == 'yes'
+
+
+def _get_max_workers(num_pdfs):
+    """Default extraction worker count: one per PDF, leaving a core for the main process."""
+    return max(1, min(num_pdfs, (os.cpu_count() or 2) - 1))
+
+
+def _title_from_lines(lines, max_words):
+    """Return the title from the first meaningful line, stopping as soon as it's found."""
+    fallback_words = []
+    for line in lines:
+        line = line.strip()
+        # Skip page markers
+        if line and not line.startswith('---'):
+            # Take first line or first N words
+            words = line.split()[:max_words]
+            title = ' '.join(words)
+            # Truncate if too long
+            if len(title) > 100:
+                title = title[:97] + "..."
+            return title
+        # Fallback: first N words of the text (only markers seen so far)
+        if len(fallback_words) < max_words:
+            fallback_words.extend(line.split())
+
+    return ' '.join(fallback_words[:max_words]) or "Untitled Document"
+
+
 def derive_title_from_text(text, max_words=10):
     """
     Derive a title from the extracted text.
@@ -114,23 +312,25 @@ def derive_title_from_text(text, max_words=10):
     if not text:
         return "Untitled Document"
 
-    # Split into lines and find first non-empty line
-    lines = text.strip().split('\n')
-    for line in lines:
-        line = line.strip()
-        # Skip page markers
-        if line and not line.startswith('---'):
-            # Take first line or first N words
-            words = line.split()[:max_words]
-            title = ' '.join(words)
-            # Truncate if too long
-            if len(title) > 100:
-                title = title[:97] + "..."
-            return title
+    return _title_from_lines(io.StringIO(text), max_words)
+
+
+def derive_title_from_stream(path, max_words=10):
+    """
+    Derive a title from an extracted text file, reading only up to the first meaningful line.
 
-    # Fallback: take first N words from entire text
-    words = text.strip().split()[:max_words]
-    return ' '.join(words) if words else "Untitled Document"
+    Args:
+        path: Path to the extracted text file
+        max_words: Maximum words for title
+
+    Returns:
+        Derived title string
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return _title_from_lines(f, max_words)
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
 
 def get_image_dimensions(image_path):
@@ -140,10 +340,19 @@ def get_image_dimensions(image_path):
     Args:
         image_path: Path to image file
 
+    PNGs (the rendered pages) are read straight from the IHDR chunk header;
+    other formats go through PIL.
+
     Returns:
         Dictionary with width and height
     """
     try:
+        with open(image_path, 'rb') as f:
+            header = f.read(24)
+        if header[:8] == _PNG_SIGNATURE and header[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', header[16:24])
+            return {"width": width, "height": height}
+
         with Image.open(image_path) as img:
             return {"width": img.width, "height": img.height}
     except Exception as e:
@@ -151,34 +360,50 @@ def get_image_dimensions(image_path):
         return {"width": 0, "height": 0}
 
 
-def ingest_pdf_to_elasticsearch(
-    output_dir,
-    es_host=None,
-    index_name=None,
-    pdf_filename=None,
-    api_key=None,
-    username=None,
-    password=None,
-    timeout=None
-):
+# Rendered page image filenames, e.g. "page12_rendered.png" (or .jpg)
+_PAGE_RE = re.compile(r'page(\d+)_rendered\.(?:png|jpg)$')
+
+
+class ORJSONSerializer(JsonSerializer):
+    """JSON serializer for Elasticsearch request/response bodies backed by orjson"""
+
+    def dumps(self, data):
+        if isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # Types orjson doesn't support (e.g. Decimal) use the default encoder
+            return super().dumps(data)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+def get_request_timeout(timeout=None):
+    """Return the request timeout in seconds (uses env var if not provided)."""
+    if timeout is not None:
+        return timeout
+    return int(os.getenv("ELASTICSEARCH_TIMEOUT", "300"))
+
+
+def create_es_client(es_host=None, api_key=None, username=None, password=None, timeout=None):
     """
-    Ingest extracted PDF data into Elasticsearch.
+    Create an Elasticsearch client from arguments or environment variables.
 
     Args:
-        output_dir: Directory containing extracted PDF data
         es_host: Elasticsearch host URL (uses env var if not provided)
-        index_name: Name of the index to ingest into (uses env var if not provided)
-        pdf_filename: Original PDF filename (for metadata)
+        api_key: API key for authentication (uses env var if not provided)
+        username: Username for basic auth (uses env var if not provided)
+        password: Password for basic auth (uses env var if not provided)
+        timeout: Request timeout in seconds (uses env var if not provided)
 
     Returns:
-        Document ID if successful, None otherwise
+        Tuple of (Elasticsearch client, request timeout in seconds)
     """
-
     # Use environment variables if not provided
     if es_host is None:
         es_host = os.getenv("ELASTICSEARCH_HOST", "http://localhost:9200")
-    if index_name is None:
-        index_name = os.getenv("ELASTICSEARCH_INDEX", "pdf_documents")
     if api_key is None:
         api_key = os.getenv("ELASTICSEARCH_API_KEY")
     if username is None:
@@ -186,42 +411,7 @@ def ingest_pdf_to_elasticsearch(
     if password is None:
         password = os.getenv("ELASTICSEARCH_PASSWORD")
 
-    inference_id = os.getenv("ELASTICSEARCH_INFERENCE_ID", "my_e5_model")
-
-    output_path = Path(output_dir)
-
-    if not output_path.exists():
-        print(f"Error: Output directory '{output_dir}' does not exist")
-        return None
-
-    print(f"Reading extracted data from: {output_dir}")
-
-    # Read extracted text
-    text_file = output_path / "extracted_text.txt"
-    if not text_file.exists():
-        print(f"Error: Text file not found at {text_file}")
-        return None
-
-    with open(text_file, 'r', encoding='utf-8') as f:
-        main_text = f.read()
-
-    print(f"  ✓ Read text ({len(main_text)} characters)")
-
-    # Derive title from text
-    title = derive_title_from_text(main_text)
-    print(f"  ✓ Derived title: {title}")
-
-    # Read captions
-    captions_file = output_path / "page_captions.json"
-    captions = {}
-    if captions_file.exists():
-        with open(captions_file, 'r', encoding='utf-8') as f:
-            captions = json.load(f)
-        print(f"  ✓ Read {len(captions)} page captions")
-    else:
-        print(f"  ! No captions file found (LM Studio may not have been used)")
-
-    # Build Elasticsearch connection parameters first (needed for embeddings)
+    # Build Elasticsearch connection parameters
     es_params = {"hosts": [es_host]}
 
     # Add authentication if provided
@@ -239,65 +429,164 @@ def ingest_pdf_to_elasticsearch(
         es_params["ca_certs"] = ca_certs
 
     # Add timeout configuration (default 300 seconds = 5 minutes for embedding generation)
-    if timeout is not None:
-        request_timeout = timeout
-    else:
-        request_timeout = int(os.getenv("ELASTICSEARCH_TIMEOUT", "300"))
+    request_timeout = get_request_timeout(timeout)
     es_params["request_timeout"] = request_timeout
 
+    # Bulk action lines and responses are (de)serialized with orjson
+    es_params["serializers"] = {"application/json": ORJSONSerializer()}
+
     # Connect to Elasticsearch
     print(f"\nConnecting to Elasticsearch at {es_host}...")
     print(f"Request timeout: {request_timeout} seconds")
-    es = Elasticsearch(**es_params)
+    return Elasticsearch(**es_params), request_timeout
+
+
+# (client id, index) pairs already confirmed to exist in this process
+_index_verified = set()
+
+
+def check_index(es, index_name):
+    """
+    Check the cluster is reachable and the target index exists.
+
+    A single HEAD request on the index covers both (no separate ping), and
+    only the first successful check per index hits the cluster.
+
+    Returns:
+        True if ready for ingestion, False otherwise
+    """
+    # Keyed by client too: another cluster may have an index of the same name
+    key = (id(es), index_name)
+    if key in _index_verified:
+        return True
 
-    if not es.ping():
+    # Check if index exists (also surfaces connection failures)
+    try:
+        exists = es.indices.exists(index=index_name)
+    except (ApiError, TransportError) as e:
+        # Connection failures, timeouts and auth errors (401/403) alike
         print("Error: Could not connect to Elasticsearch")
-        return None
+        print(f"  {e}")
+        return False
 
     print("Connected successfully!")
 
-    # Check if index exists
-    if not es.indices.exists(index=index_name):
+    if not exists:
         print(f"Error: Index '{index_name}' does not exist")
         print("Run elasticsearch_setup.py first to create the index")
+        return False
+
+    _index_verified.add(key)
+    return True
+
+
+def _rendered_pages(output_path):
+    """
+    Return (page_number, image path) pairs for the rendered pages, in page order.
+
+    A directory re-rendered in another format can hold both page{N}_rendered.png
+    and .jpg; the format recorded in the extractor's stamp file wins, otherwise
+    the newer file.
+    """
+    preferred = None
+    try:
+        stamp = orjson.loads((output_path / pdf_extractor.STAMP_FILENAME).read_bytes())
+        preferred = f".{stamp.get('format')}"
+    except (OSError, orjson.JSONDecodeError, AttributeError):
+        pass
+
+    candidates = {}
+    for img_path in output_path.glob("page*_rendered.*"):
+        if match := _PAGE_RE.search(img_path.name):
+            candidates.setdefault(int(match.group(1)), []).append(img_path)
+
+    return sorted(
+        (page_number, max(paths, key=lambda path: (path.suffix == preferred, path.stat().st_mtime)))
+        for page_number, paths in candidates.items()
+    )
+
+
+def build_document(output_dir, pdf_filename=None):
+    """
+    Build the Elasticsearch document for an extracted PDF.
+
+    Args:
+        output_dir: Directory containing extracted PDF data
+        pdf_filename: Original PDF filename (for metadata)
+
+    Returns:
+        Document dict if successful, None otherwise
+    """
+    output_path = Path(output_dir)
+
+    if not output_path.exists():
+        print(f"Error: Output directory '{output_dir}' does not exist")
+        return None
+
+    print(f"Reading extracted data from: {output_dir}")
+
+    # Read extracted text
+    text_file = output_path / "extracted_text.txt"
+    if not text_file.exists():
+        print(f"Error: Text file not found at {text_file}")
         return None
 
+    # Derive title from the start of the file, then read the full text for indexing
+    title = derive_title_from_stream(text_file)
+
+    with open(text_file, 'r', encoding='utf-8') as f:
+        main_text = f.read()
+
+    print(f"  ✓ Read text ({len(main_text)} characters)")
+    print(f"  ✓ Derived title: {title}")
+
+    # Read captions
+    captions_file = output_path / "page_captions.json"
+    captions = {}
+    if captions_file.exists():
+        with open(captions_file, 'rb') as f:
+            captions = orjson.loads(f.read())
+        print(f"  ✓ Read {len(captions)} page captions")
+    else:
+        print(f"  ! No captions file found (LM Studio may not have been used)")
+
     # Build page_descriptions array (without embeddings - pipeline will generate them)
     print("\nProcessing page descriptions...")
     page_descriptions = []
 
-    # Find all rendered page images
-    rendered_images = sorted(output_path.glob("page*_rendered.png"))
+    # Absolute output directory, resolved once for every page's image path
+    abs_base = str(output_path.absolute())
 
-    for img_path in rendered_images:
-        # Extract page number from filename (e.g., "page1_rendered.png" -> 1)
-        page_num_str = img_path.stem.split('_')[0].replace('page', '')
-        try:
-            page_number = int(page_num_str)
-        except ValueError:
-            continue
+    # Find the rendered page images, one per page, in page order (page2 before page10)
+    pages = _rendered_pages(output_path)
 
+    # Read image dimensions concurrently (I/O-bound header reads)
+    with ThreadPoolExecutor(max_workers=min(32, len(pages) or 1)) as executor:
+        all_dimensions = list(executor.map(get_image_dimensions, [str(img_path) for _, img_path in pages]))
+
+    for (page_number, img_path), dimensions in zip(pages, all_dimensions):
         page_key = f"page{page_number}"
         description_text = captions.get(page_key, "No description available")
 
-        # Get image dimensions
-        dimensions = get_image_dimensions(str(img_path))
-
         page_desc = {
             "page_number": page_number,
             "description_text": description_text,
-            "image_path": str(img_path.absolute()),
+            "image_path": f"{abs_base}/{img_path.name}",
             "image_dimensions": dimensions
         }
         # Note: description_vector will be generated automatically by the ingest pipeline
 
         page_descriptions.append(page_desc)
 
+    cached = apply_cached_embeddings(page_descriptions)
     print(f"  ✓ Prepared {len(page_descriptions)} page descriptions")
-    print(f"  Note: Embeddings will be generated automatically by ingest pipeline")
+    if cached:
+        print(f"  ✓ Reused {cached} cached embedding(s)")
+    if cached < len(page_descriptions):
+        print(f"  Note: Remaining embeddings will be generated in batches during indexing")
 
-    # Count total pages (from text markers or rendered images)
-    total_pages = len(rendered_images)
+    # Count total pages (from rendered images)
+    total_pages = len(pages)
 
     # Build document
     document = {
@@ -307,22 +596,236 @@ def ingest_pdf_to_elasticsearch(
         "page_descriptions": page_descriptions,
         "extracted_date": datetime.now().isoformat(),
         "total_pages": total_pages,
-        "output_directory": str(output_path.absolute())
+        "output_directory": abs_base,
+        "content_sha": content_sha(main_text, page_descriptions)
     }
 
-    print(document)
+    logger.debug("Built document: title=%s pages=%d text_len=%d", title, total_pages, len(main_text))
+    return document
+
+
+def index_documents(es, index_name, documents, request_timeout):
+    """
+    Index documents through the _bulk API.
+
+    Chunks of documents are sent from several threads so Elasticsearch runs the
+    ingest pipeline (embedding generation) for them in parallel. Failures are
+    reported per document instead of aborting the whole batch.
+
+    Documents whose content is already indexed (same content_sha) are not sent
+    again, so main_text and the page descriptions aren't re-embedded.
+
+    Documents are streamed to the bulk helper and taken off the queue as they
+    are serialized. When documents is a deque owned by the caller, each
+    document (full text and page descriptions) is released once its chunk has
+    been sent instead of living until the whole batch is indexed.
+
+    Args:
+        es: Elasticsearch client
+        index_name: Name of the index to ingest into
+        documents: Documents to index (a deque is consumed in place)
+        request_timeout: Timeout in seconds for each bulk request
+
+    Returns:
+        List with the document ID (or None on failure) for each document, in order
+    """
+    queue = documents if isinstance(documents, deque) else deque(documents)
+    duplicates = find_indexed_duplicates(es, index_name, {document["content_sha"] for document in queue})
+
+    # Only what's needed after indexing is kept per document
+    existing_ids = []  # ID of an already indexed copy (None if sent), in input order
+    needs_cache = []   # whether a sent document had pages without a cached embedding
+
+    def actions():
+        while queue:
+            document = queue.popleft()
+            existing_id = duplicates.get(document["content_sha"])
+            existing_ids.append(existing_id)
+            if existing_id:
+                print(f"  ✓ '{document['filename']}' is already indexed as {existing_id}, skipping")
+                continue
+            # Embeddings are computed here, overlapping with the bulk requests already in flight
+            embed_page_descriptions(es, document["page_descriptions"])
+            needs_cache.append(any("description_vector" not in page for page in document["page_descriptions"]))
+            yield {"_index": index_name, "_source": document}
+
+    new_ids = []
+    results = helpers.parallel_bulk(
+        es.options(request_timeout=request_timeout),
+        actions(),
+        thread_count=BULK_THREAD_COUNT,
+        chunk_size=BULK_CHUNK_SIZE,
+        raise_on_error=False,
+        raise_on_exception=False,
+        timeout=f"{request_timeout}s",
+        # Name the embedding pipeline (created by elasticsearch_setup.py) on each
+        # bulk request rather than relying on the index's default_pipeline
+        pipeline=f"{index_name}_pipeline",
+    )
+    for ok, item in results:
+        info = item.get("index", {})
+        if ok:
+            new_ids.append(info.get("_id"))
+        else:
+            print(f"✗ Failed to index document: {info.get('error') or info.get('exception') or item}")
+            new_ids.append(None)
+
+    # Cache the embeddings generated for pages that weren't cached yet
+    cache_indexed_embeddings(es, index_name, [
+        doc_id for doc_id, needed in zip(new_ids, needs_cache) if doc_id and needed
+    ])
+
+    new_ids = iter(new_ids)
+    return [existing_id or next(new_ids) for existing_id in existing_ids]
+
+
+def extract_pdfs(jobs, workers):
+    """
+    Extract PDFs in a process pool.
+
+    Args:
+        jobs: (idx, pdf_file, output_dir, reuse_existing) tuples
+        workers: Number of worker processes
+
+    Yields:
+        (idx, pdf_file, extraction directory or None) as each extraction finishes
+    """
+    # Each worker's extraction gets a share of the render and caption budgets
+    # instead of nesting full-size pools in every worker
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=pdf_extractor.configure_batch_worker, initargs=(workers,)
+    ) as executor:
+        futures = {
+            executor.submit(extract_pdf, str(pdf_file), str(output_dir), reuse): (idx, pdf_file)
+            for idx, pdf_file, output_dir, reuse in jobs
+        }
+        for future in as_completed(futures):
+            idx, pdf_file = futures[future]
+            try:
+                extraction_dir = future.result()
+            except Exception as e:
+                print(f"Error: {e}")
+                extraction_dir = None
+
+            if extraction_dir:
+                print(f"[{idx}/{len(jobs)}] ✓ Extracted: {pdf_file.name}")
+            yield idx, pdf_file, extraction_dir
+
+
+def index_as_ready(es, index_name, prepared, request_timeout, max_pending=2):
+    """
+    Bulk index documents while later ones are still being prepared.
+
+    Documents are grouped into batches that are indexed on a background
+    thread, so extraction and indexing overlap. At most max_pending batches
+    wait for indexing before preparation pauses.
+
+    build_document() (on this thread) and index_documents() (on the indexing
+    thread) both use the shelve embedding cache, which isn't thread-safe; every
+    access goes through _embedding_cache_lock.
+
+    Args:
+        es: Elasticsearch client
+        index_name: Name of the index to ingest into
+        prepared: Iterable of (key, document) pairs; document is None for failures
+        request_timeout: Timeout in seconds for each bulk request
+        max_pending: Maximum number of batches queued for indexing
+
+    Returns:
+        List of (key, document ID or None) pairs
+    """
+    results = []
+    pending = deque()
+    batch = []
+    batch_size = BULK_CHUNK_SIZE * BULK_THREAD_COUNT
+
+    def collect():
+        keys, future = pending.popleft()
+        try:
+            doc_ids = future.result()
+        except Exception as e:
+            print(f"✗ Bulk indexing failed: {e}")
+            doc_ids = [None] * len(keys)
+        results.extend(zip(keys, doc_ids))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        def submit():
+            keys = [key for key, _ in batch]
+            # Handed over as a deque so index_documents can release each document once sent
+            documents = deque(document for _, document in batch)
+            pending.append((keys, executor.submit(index_documents, es, index_name, documents, request_timeout)))
+            batch.clear()
+            if len(pending) > max_pending:
+                collect()
+
+        for key, document in prepared:
+            if document is None:
+                results.append((key, None))
+                continue
+            batch.append((key, document))
+            if len(batch) >= batch_size:
+                submit()
+
+        if batch:
+            submit()
+        while pending:
+            collect()
+
+    return results
+
+
+def ingest_pdf_to_elasticsearch(
+    output_dir,
+    es_host=None,
+    index_name=None,
+    pdf_filename=None,
+    api_key=None,
+    username=None,
+    password=None,
+    timeout=None,
+    es_client=None
+):
+    """
+    Ingest extracted PDF data into Elasticsearch.
+
+    Args:
+        output_dir: Directory containing extracted PDF data
+        es_host: Elasticsearch host URL (uses env var if not provided)
+        index_name: Name of the index to ingest into (uses env var if not provided)
+        pdf_filename: Original PDF filename (for metadata)
+        es_client: Existing Elasticsearch client to reuse (created from the
+            connection arguments if not provided)
+
+    Returns:
+        Document ID if successful, None otherwise
+    """
+    if index_name is None:
+        index_name = os.getenv("ELASTICSEARCH_INDEX", "pdf_documents")
+
+    document = build_document(output_dir, pdf_filename)
+    if document is None:
+        return None
+
+    if es_client is None:
+        es, request_timeout = create_es_client(es_host, api_key, username, password, timeout)
+    else:
+        es, request_timeout = es_client, get_request_timeout(timeout)
+    if not check_index(es, index_name):
+        return None
+
     # Index the document
     print(f"\nIndexing document to '{index_name}'...")
     print(f"Note: This may take a while as embeddings are being generated...")
-    result = es.index(index=index_name, document=document, timeout=f"{request_timeout}s")
+    doc_id = index_documents(es, index_name, [document], request_timeout)[0]
+    if doc_id is None:
+        return None
 
-    doc_id = result['_id']
     print(f"✓ Document indexed successfully!")
     print(f"  Document ID: {doc_id}")
     print(f"  Index: {index_name}")
-    print(f"  Title: {title}")
-    print(f"  Pages: {total_pages}")
-    print(f"  Descriptions: {len(page_descriptions)}")
+    print(f"  Title: {document['title']}")
+    print(f"  Pages: {document['total_pages']}")
+    print(f"  Descriptions: {len(document['page_descriptions'])}")
 
     return doc_id
 
@@ -361,6 +864,18 @@ def main():
         action="store_true",
         help="Skip extraction step (assumes PDFs are already extracted in renders/)"
     )
+    parser.add_argument(
+        "--reuse-extraction",
+        choices=sorted(_REUSE_CHOICES),
+        default=None,
+        help="Reuse existing extraction directories (default: 'ask' for a single PDF, 'yes' for a directory of PDFs)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parallel PDF extractions in batch mode (default: CPU count - 1)"
+    )
     parser.add_argument(
         "--timeout",
         type=int,
@@ -370,6 +885,9 @@ def main():
 
     args = parser.parse_args()
 
+    # Debug output (built documents) is opt-in via LOG_LEVEL=DEBUG
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
     try:
         input_path = Path(args.input_path)
 
@@ -382,7 +900,8 @@ def main():
 
             # Determine output directory for this specific PDF
             pdf_output_dir = Path(args.output_dir) / input_path.stem
-            extraction_dir = extract_pdf(str(input_path), str(pdf_output_dir))
+            reuse = _REUSE_CHOICES[args.reuse_extraction or "ask"]
+            extraction_dir = extract_pdf(str(input_path), str(pdf_output_dir), reuse)
             if not extraction_dir:
                 print("\n✗ Extraction failed")
                 sys.exit(1)
@@ -458,45 +977,66 @@ def main():
                 failed_ingestions = 0
                 doc_ids = []
 
-                for idx, pdf_file in enumerate(pdf_files, 1):
-                    print(f"\n[{idx}/{len(pdf_files)}] Processing: {pdf_file.name}")
-                    print("=" * 60)
-
-                    # Determine output directory for this PDF
-                    pdf_output_dir = Path(args.output_dir) / pdf_file.stem
+                total = len(pdf_files)
 
-                    # Extract if not skipping extraction
-                    if not args.skip_extraction:
-                        print("\nSTEP 1: EXTRACTING PDF")
-                        print("-" * 60)
+                # Connect once up front; documents are indexed while later PDFs are still extracting
+                index_name = args.index or os.getenv("ELASTICSEARCH_INDEX", "pdf_documents")
+                es, request_timeout = create_es_client(args.host, timeout=args.timeout)
+                if not check_index(es, index_name):
+                    sys.exit(1)
 
-                        extraction_dir = extract_pdf(str(pdf_file), str(pdf_output_dir))
-                        if not extraction_dir:
-                            print(f"\n✗ Extraction failed for {pdf_file.name}")
-                            failed_ingestions += 1
-                            continue
-                    else:
+                if not args.skip_extraction:
+                    # Decide on existing extractions up front so workers never wait
+                    # on a prompt, then extract the PDFs in parallel
+                    default_reuse = _REUSE_CHOICES[args.reuse_extraction or "yes"]
+                    jobs = []
+                    for idx, pdf_file in enumerate(pdf_files, 1):
+                        pdf_output_dir = Path(args.output_dir) / pdf_file.stem
+                        reuse = default_reuse
+                        if reuse is None and pdf_output_dir.exists():
+                            print(f"\n[{idx}/{total}] {pdf_file.name}: directory '{pdf_output_dir}' already exists")
+                            reuse = _ask_reuse_extraction()
+                        jobs.append((idx, pdf_file, pdf_output_dir, reuse))
+
+                    workers = args.workers or _get_max_workers(total)
+                    print("\nSTEP 1: EXTRACTING PDFS")
+                    print(f"Workers: {workers}")
+                    print("-" * 60)
+                    extracted = extract_pdfs(jobs, workers)
+                else:
+                    extracted = []
+                    for idx, pdf_file in enumerate(pdf_files, 1):
                         # Check if extraction directory exists
+                        pdf_output_dir = Path(args.output_dir) / pdf_file.stem
                         if not pdf_output_dir.exists():
-                            print(f"✗ Extraction directory not found: {pdf_output_dir}")
+                            print(f"[{idx}/{total}] ✗ Extraction directory not found: {pdf_output_dir}")
                             print(f"  Run without --skip-extraction first")
                             failed_ingestions += 1
                             continue
-                        extraction_dir = str(pdf_output_dir)
-                        print(f"Using existing extraction: {extraction_dir}")
+                        extracted.append((idx, pdf_file, str(pdf_output_dir)))
+                        print(f"[{idx}/{total}] Using existing extraction: {pdf_output_dir}")
 
-                    # Ingest to Elasticsearch
-                    print("\nSTEP 2: INGESTING TO ELASTICSEARCH")
-                    print("-" * 60)
+                def prepared():
+                    for idx, pdf_file, extraction_dir in extracted:
+                        if not extraction_dir:
+                            print(f"\n[{idx}/{total}] ✗ Extraction failed for {pdf_file.name}")
+                            yield pdf_file, None
+                            continue
 
-                    doc_id = ingest_pdf_to_elasticsearch(
-                        output_dir=extraction_dir,
-                        es_host=args.host,
-                        index_name=args.index,
-                        pdf_filename=pdf_file.name,
-                        timeout=args.timeout
-                    )
+                        print(f"\n[{idx}/{total}] Processing: {pdf_file.name}")
+                        print("=" * 60)
 
+                        # Prepare the document for bulk ingestion
+                        print("\nSTEP 2: PREPARING DOCUMENT")
+                        print("-" * 60)
+
+                        document = build_document(extraction_dir, pdf_file.name)
+                        if document is None:
+                            print(f"✗ Could not prepare document for {pdf_file.name}")
+                        yield pdf_file, document
+                        print("=" * 60)
+
+                for pdf_file, doc_id in index_as_ready(es, index_name, prepared(), request_timeout):
                     if doc_id:
                         print(f"✓ Successfully indexed: {pdf_file.name}")
                         print(f"  Document ID: {doc_id}")
@@ -506,8 +1046,6 @@ def main():
                         print(f"✗ Ingestion failed for {pdf_file.name}")
                         failed_ingestions += 1
 
-                    print("=" * 60)
-
                 # Print summary
                 print("\n" + "=" * 60)
                 print("BATCH PROCESSING COMPLETE")
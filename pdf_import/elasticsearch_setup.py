@@ -6,6 +6,7 @@ Creates the index with proper mappings for PDF document ingestion.
 
 import sys
 import os
+import copy
 from pathlib import Path
 from elasticsearch import Elasticsearch
 
@@ -17,6 +18,116 @@ from config_loader import load_config
 load_config()
 
 
+# Index mappings; main_text's inference endpoint is filled in per index
+_MAPPINGS_TEMPLATE = {
+    "properties": {
+        "title": {
+            "type": "text",
+            "fields": {
+                "keyword": {
+                    "type": "keyword"
+                }
+            }
+        },
+        "filename": {
+            "type": "keyword"
+        },
+        "main_text": {
+            "type": "semantic_text",
+            "inference_id": None  # set by build_mappings()
+        },
+        # Kept nested (not flattened into per-page documents): the search tool
+        # returns a document's best-matching pages through nested inner_hits
+        "page_descriptions": {
+            "type": "nested",
+            "properties": {
+                "page_number": {
+                    "type": "integer"
+                },
+                "description_text": {
+                    "type": "text"
+                },
+                "description_vector": {
+                    "type": "dense_vector",
+                    "dims": 384,
+                    "index": True,
+                    "similarity": "cosine",
+                    # int8-quantized HNSW graph: ~4x smaller in memory, floats kept for rescoring
+                    "index_options": {
+                        "type": "int8_hnsw",
+                        "m": 16,
+                        "ef_construction": 100
+                    }
+                },
+                "image_path": {
+                    "type": "keyword"
+                },
+                "image_dimensions": {
+                    "type": "object",
+                    "properties": {
+                        "width": {"type": "integer"},
+                        "height": {"type": "integer"}
+                    }
+                }
+            }
+        },
+        "extracted_date": {
+            "type": "date"
+        },
+        "total_pages": {
+            "type": "integer"
+        },
+        "output_directory": {
+            "type": "keyword"
+        },
+        # Hash of main_text + page descriptions, used to skip re-ingesting identical content
+        "content_sha": {
+            "type": "keyword"
+        }
+    }
+}
+
+# Ingest pipeline generating embeddings for page descriptions that arrive
+# without one; the inference model is filled in per index
+_PIPELINE_TEMPLATE = {
+    "description": "Generate embeddings for page descriptions using inference processor",
+    "processors": [
+        {
+            "foreach": {
+                "field": "page_descriptions",
+                "processor": {
+                    "inference": {
+                        "model_id": None,  # set by build_pipeline()
+                        # Pages with a cached embedding already carry a vector
+                        "if": "ctx._ingest._value.description_vector == null",
+                        "input_output": [
+                            {
+                                "input_field": "_ingest._value.description_text",
+                                "output_field": "_ingest._value.description_vector"
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    ]
+}
+
+
+def build_mappings(inference_id):
+    """Return the index mappings using the given inference endpoint."""
+    mappings = copy.deepcopy(_MAPPINGS_TEMPLATE)
+    mappings["properties"]["main_text"]["inference_id"] = inference_id
+    return mappings
+
+
+def build_pipeline(inference_id):
+    """Return the ingest pipeline definition using the given inference endpoint."""
+    pipeline = copy.deepcopy(_PIPELINE_TEMPLATE)
+    pipeline["processors"][0]["foreach"]["processor"]["inference"]["model_id"] = inference_id
+    return pipeline
+
+
 def create_elasticsearch_index(
     es_host=None,
     index_name=None,
@@ -91,93 +202,14 @@ def create_elasticsearch_index(
             print("Keeping existing index. Exiting...")
             return
 
-    # Define the mapping
-    mapping = {
-        "mappings": {
-            "properties": {
-                "title": {
-                    "type": "text",
-                    "fields": {
-                        "keyword": {
-                            "type": "keyword"
-                        }
-                    }
-                },
-                "filename": {
-                    "type": "keyword"
-                },
-                "main_text": {
-                    "type": "semantic_text",
-                    "inference_id": inference_id
-                },
-                "page_descriptions": {
-                    "type": "nested",
-                    "properties": {
-                        "page_number": {
-                            "type": "integer"
-                        },
-                        "description_text": {
-                            "type": "text"
-                        },
-                        "description_vector": {
-                            "type": "dense_vector",
-                            "dims": 384,
-                            "index": True,
-                            "similarity": "cosine"
-                        },
-                        "image_path": {
-                            "type": "keyword"
-                        },
-                        "image_dimensions": {
-                            "type": "object",
-                            "properties": {
-                                "width": {"type": "integer"},
-                                "height": {"type": "integer"}
-                            }
-                        }
-                    }
-                },
-                "extracted_date": {
-                    "type": "date"
-                },
-                "total_pages": {
-                    "type": "integer"
-                },
-                "output_directory": {
-                    "type": "keyword"
-                }
-            }
-        }
-    }
-
     # Create ingest pipeline for automatic embedding generation
     pipeline_name = f"{index_name}_pipeline"
     print(f"\nCreating ingest pipeline '{pipeline_name}'...")
 
-    pipeline_definition = {
-        "description": "Generate embeddings for page descriptions using inference processor",
-        "processors": [
-            {
-                "foreach": {
-                    "field": "page_descriptions",
-                    "processor": {
-                        "inference": {
-                            "model_id": inference_id,
-                            "input_output": [
-                                {
-                                    "input_field": "_ingest._value.description_text",
-                                    "output_field": "_ingest._value.description_vector"
-                                }
-                            ]
-                        }
-                    }
-                }
-            }
-        ]
-    }
+    pipeline_definition = build_pipeline(inference_id)
 
     try:
-        es.ingest.put_pipeline(id=pipeline_name, body=pipeline_definition)
+        es.ingest.put_pipeline(id=pipeline_name, **pipeline_definition)
         print(f"✓ Ingest pipeline '{pipeline_name}' created successfully!")
     except Exception as e:
         print(f"Warning: Failed to create ingest pipeline: {e}")
@@ -187,16 +219,11 @@ def create_elasticsearch_index(
     print(f"\nCreating index '{index_name}' with semantic_text mappings...")
 
     # Add default pipeline to index settings
-    index_settings = {
-        "settings": {
-            "index": {
-                "default_pipeline": pipeline_name
-            }
-        },
-        "mappings": mapping["mappings"]
-    }
-
-    es.indices.create(index=index_name, body=index_settings)
+    es.indices.create(
+        index=index_name,
+        settings={"index": {"default_pipeline": pipeline_name}},
+        mappings=build_mappings(inference_id)
+    )
     print(f"✓ Index '{index_name}' created successfully!")
     print(f"  Default pipeline: {pipeline_name}")
 
@@ -208,13 +235,14 @@ def create_elasticsearch_index(
     print(f"  - page_descriptions: nested array")
     print(f"    - page_number: integer")
     print(f"    - description_text: text (stores the caption)")
-    print(f"    - description_vector: dense_vector (384 dims, cosine similarity)")
-    print(f"      → Auto-generated via ingest pipeline from description_text")
+    print(f"    - description_vector: dense_vector (384 dims, cosine similarity, int8_hnsw)")
+    print(f"      → Auto-generated via ingest pipeline from description_text (unless supplied)")
     print(f"    - image_path: keyword")
     print(f"    - image_dimensions: object (width, height)")
     print(f"  - extracted_date: date")
     print(f"  - total_pages: integer")
     print(f"  - output_directory: keyword")
+    print(f"  - content_sha: keyword (dedupes identical content on ingest)")
 
     print(f"\n✓ Setup complete! Ready to ingest PDF documents.")
     print(f"  Embeddings will be automatically generated during ingestion.")
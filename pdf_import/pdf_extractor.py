@@ -7,29 +7,130 @@ Extracts all text and images from a PDF file.
 import sys
 import io
 import base64
+import hashlib
 import json
 import os
+import re
+import threading
 import argparse
+import atexit
+import functools
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import NamedTuple, Optional
 from PIL import Image
 import fitz  # PyMuPDF
+from tqdm import tqdm
 import requests
+from requests.adapters import HTTPAdapter
 
-# Add parent directory to path to import config_loader
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# Add parent directory to path to import config_loader (once: spawned worker
+# processes start with the parent process's sys.path already set)
+_PROJECT_ROOT = str(Path(__file__).parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
 from config_loader import load_config
 
-# Load environment variables (checks local and parent directories)
+# Load environment variables (checks local and parent directories). This has to
+# run at import: the settings below are read from the environment. Worker
+# processes inherit the loaded values and skip the .env search.
 load_config()
 
+# Concurrent caption requests sent to LM Studio
+LM_STUDIO_CONCURRENCY = int(os.getenv("LM_STUDIO_CONCURRENCY", "8"))
 
-def get_image_caption_from_lm_studio(image_path, lm_studio_url=None):
+# Keep-alive connections to LM Studio shared by all caption requests
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=LM_STUDIO_CONCURRENCY))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=LM_STUDIO_CONCURRENCY))
+atexit.register(_SESSION.close)
+
+
+# DPI of the page rendering sent to the vision model (archival images use PDF_RENDER_DPI)
+CAPTION_RENDER_DPI = int(os.getenv("CAPTION_RENDER_DPI", "96"))
+
+# Images above this size are downscaled before being sent for captioning
+CAPTION_MAX_BYTES = 2_000_000
+CAPTION_MAX_SIZE = (1600, 1600)
+
+
+CAPTION_PROMPT = "Describe this image in detail. If it contains graphs, charts, or data visualizations, describe what they show including any trends, labels, or key insights."
+CAPTION_MAX_TOKENS = 500
+
+# Pages sent to LM Studio per caption request (1 = one request per page)
+LM_STUDIO_BATCH_SIZE = int(os.getenv("LM_STUDIO_BATCH_SIZE", "1"))
+
+# "PAGE 3:" markers separating the descriptions in a batched caption response
+_BATCH_CAPTION_RE = re.compile(r'^[\s*#]*PAGE\s+(\d+)\s*\**\s*:\**', re.IGNORECASE | re.MULTILINE)
+
+# Captions keyed by SHA-256 of the image sent, so identical pages skip the vision model
+CAPTION_CACHE_ENABLED = os.getenv("CAPTION_CACHE_ENABLED", "true").lower() == "true"
+CAPTION_CACHE_DIR = Path(os.getenv("CAPTION_CACHE_DIR", "~/.cache/document_image_search/captions")).expanduser()
+
+
+def _caption_png(image_path):
+    """
+    Return the image bytes (PNG or JPEG) to send to the vision model for an image file.
+
+    Files larger than CAPTION_MAX_BYTES are downscaled to fit CAPTION_MAX_SIZE,
+    which bounds the raw, base64 and JSON copies held while the request is built.
+    """
+    if os.path.getsize(image_path) <= CAPTION_MAX_BYTES:
+        with open(image_path, "rb") as image_file:
+            return image_file.read()
+
+    with Image.open(image_path) as img:
+        img.thumbnail(CAPTION_MAX_SIZE)
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _image_data_url(image_bytes):
+    """Return a base64 data URL for PNG or JPEG image bytes."""
+    mime = "image/jpeg" if image_bytes[:3] == b"\xff\xd8\xff" else "image/png"
+    return f"data:{mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+
+
+@functools.lru_cache(maxsize=None)
+def _caption_settings_dir(lm_studio_url, batched):
+    """
+    Cache subdirectory for the settings a caption depends on: endpoint, model
+    (LMSTUDIO_MODEL), prompt, token limit, and single vs "PAGE k:" batched prompt.
+    """
+    settings = json.dumps([
+        lm_studio_url, os.getenv("LMSTUDIO_MODEL", ""), CAPTION_PROMPT, CAPTION_MAX_TOKENS, batched
+    ])
+    return CAPTION_CACHE_DIR / hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+
+def _caption_cache_file(image_bytes, lm_studio_url, batched=False):
+    """Return the cache file for an image's caption, or None when caching is disabled."""
+    if not CAPTION_CACHE_ENABLED:
+        return None
+    return _caption_settings_dir(lm_studio_url, batched) / f"{hashlib.sha256(image_bytes).hexdigest()}.txt"
+
+
+def _store_cached_caption(cache_file, caption):
+    """Write a caption to the cache atomically (concurrent requests may race)."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_file.write_text(caption, encoding="utf-8")
+        tmp_file.replace(cache_file)
+    except OSError as e:
+        print(f"    Warning: Could not cache caption: {e}")
+
+
+def get_image_caption_from_lm_studio(image_path, lm_studio_url=None, image_bytes=None):
     """
     Get a caption for an image using LM Studio's vision model.
 
     Args:
         image_path: Path to the image file
         lm_studio_url: URL of LM Studio API endpoint (uses env var if not provided)
+        image_bytes: PNG or JPEG bytes to caption instead of reading image_path
 
     Returns:
         Caption string or None if failed
@@ -43,9 +144,13 @@ def get_image_caption_from_lm_studio(image_path, lm_studio_url=None):
         return None
 
     try:
-        # Read and encode image to base64
-        with open(image_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode("utf-8")
+        # Read the image (large renders are downscaled first)
+        if image_bytes is None:
+            image_bytes = _caption_png(image_path)
+
+        cache_file = _caption_cache_file(image_bytes, lm_studio_url)
+        if cache_file is not None and cache_file.exists():
+            return cache_file.read_text(encoding="utf-8")
 
         # Prepare the request for LM Studio's OpenAI-compatible API
         payload = {
@@ -56,28 +161,30 @@ def get_image_caption_from_lm_studio(image_path, lm_studio_url=None):
                     "content": [
                         {
                             "type": "text",
-                            "text": "Describe this image in detail. If it contains graphs, charts, or data visualizations, describe what they show including any trends, labels, or key insights."
+                            "text": CAPTION_PROMPT
                         },
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{image_data}"
+                                "url": _image_data_url(image_bytes)
                             }
                         }
                     ]
                 }
             ],
-            "max_tokens": 500,
+            "max_tokens": CAPTION_MAX_TOKENS,
             "temperature": 0.7
         }
 
         # Make request to LM Studio
-        response = requests.post(lm_studio_url, json=payload, timeout=60)
+        response = _SESSION.post(lm_studio_url, json=payload, timeout=60)
 
         if response.status_code == 200:
             result = response.json()
-            caption = result["choices"][0]["message"]["content"]
-            return caption.strip()
+            caption = result["choices"][0]["message"]["content"].strip()
+            if cache_file is not None and caption:
+                _store_cached_caption(cache_file, caption)
+            return caption
         else:
             print(f"    Warning: LM Studio API returned status {response.status_code}")
             return None
@@ -91,90 +198,444 @@ def get_image_caption_from_lm_studio(image_path, lm_studio_url=None):
         return None
 
 
-def render_pages_to_images(pdf_path, output_dir, dpi=None, use_captions=True, mono=False):
+def _split_batch_captions(text, count):
+    """Split a batched caption response into per-page captions (None where missing)."""
+    captions = [None] * count
+    markers = list(_BATCH_CAPTION_RE.finditer(text))
+    for match, next_match in zip(markers, markers[1:] + [None]):
+        page = int(match.group(1))
+        if 1 <= page <= count:
+            caption = text[match.end():next_match.start() if next_match else len(text)].strip()
+            captions[page - 1] = caption or None
+    return captions
+
+
+def get_image_captions_batch(pages, lm_studio_url=None):
     """
-    Render each PDF page to an image (captures vector graphics like graphs/charts).
+    Get captions for several images with a single LM Studio request.
+
+    The model is asked to prefix each description with "PAGE k:". Images
+    whose description can't be found in the response are captioned with
+    individual requests.
 
     Args:
-        pdf_path: Path to the PDF file
-        output_dir: Directory to save rendered page images
-        dpi: Resolution for rendering (uses env var if not provided, default 150)
-        use_captions: Whether to generate captions using LM Studio (default True)
-        mono: Whether to render in monochrome/grayscale (default False)
+        pages: List of (image_path, image_bytes or None) pairs
+        lm_studio_url: URL of LM Studio API endpoint (uses env var if not provided)
 
     Returns:
-        Tuple of (number of pages rendered, captions dictionary)
+        List of caption strings (None where failed), in the order of pages
     """
-    # Use environment variable if not provided
-    if dpi is None:
-        dpi = int(os.getenv("PDF_RENDER_DPI", "150"))
+    if lm_studio_url is None:
+        lm_studio_url = os.getenv("LM_STUDIO_URL", "http://localhost:1234/v1/chat/completions")
+
+    if os.getenv("LM_STUDIO_ENABLED", "true").lower() == "false":
+        return [None] * len(pages)
 
+    captions = [None] * len(pages)
     try:
-        doc = fitz.open(pdf_path)
-        page_count = 0
-        captions = {}
+        # Serve what we can from the cache; batch the rest
+        pending = []  # (index, image_bytes, cache_file)
+        for index, (image_path, image_bytes) in enumerate(pages):
+            if image_bytes is None:
+                image_bytes = _caption_png(image_path)
+            cache_file = _caption_cache_file(image_bytes, lm_studio_url, batched=True)
+            if cache_file is not None and cache_file.exists():
+                captions[index] = cache_file.read_text(encoding="utf-8")
+            else:
+                pending.append((index, image_bytes, cache_file))
+
+        if len(pending) > 1:
+            content = [{
+                "type": "text",
+                "text": (f"The following {len(pending)} images are pages of a document. For each image, in order, "
+                         f"start a new line with 'PAGE k:' (k = 1 to {len(pending)}) followed by its description. "
+                         f"{CAPTION_PROMPT}")
+            }]
+            for _, image_bytes, _ in pending:
+                content.append({"type": "image_url", "image_url": {"url": _image_data_url(image_bytes)}})
+
+            payload = {
+                "model": "local-model",  # LM Studio uses whatever model is loaded
+                "messages": [{"role": "user", "content": content}],
+                "max_tokens": CAPTION_MAX_TOKENS * len(pending),
+                "temperature": 0.7
+            }
+            response = _SESSION.post(lm_studio_url, json=payload, timeout=60 * len(pending))
+
+            if response.status_code == 200:
+                text = response.json()["choices"][0]["message"]["content"]
+                for (index, _, cache_file), caption in zip(pending, _split_batch_captions(text, len(pending))):
+                    if caption:
+                        captions[index] = caption
+                        if cache_file is not None:
+                            _store_cached_caption(cache_file, caption)
+            else:
+                print(f"    Warning: LM Studio API returned status {response.status_code}")
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
+    except requests.exceptions.ConnectionError:
+        print(f"    Warning: Could not connect to LM Studio at {lm_studio_url}")
+        print(f"    Make sure LM Studio is running with a vision-capable model loaded")
+        return captions
+    except Exception as e:
+        print(f"    Warning: Error getting batched captions: {e}")
 
-            # Render page to image at specified DPI
-            # Higher DPI = better quality but larger files
-            mat = fitz.Matrix(dpi / 72, dpi / 72)  # 72 is default DPI
+    # Anything the batch didn't describe is captioned on its own
+    for index, (image_path, image_bytes) in enumerate(pages):
+        if captions[index] is None:
+            captions[index] = get_image_caption_from_lm_studio(image_path, lm_studio_url, image_bytes)
+    return captions
 
-            # Render with or without color
-            if mono:
-                pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY)
-            else:
-                pix = page.get_pixmap(matrix=mat)
 
-            # Save as PNG
-            image_filename = f"{output_dir}/page{page_num + 1}_rendered.png"
-            pix.save(image_filename)
+def _progress(iterable, desc, total=None, verbose=False, unit="page"):
+    """
+    Wrap a per-page (or per-image) loop in a progress bar.
+
+    The bar is left out with verbose (per-item lines are printed instead) and
+    when stdout isn't a terminal, e.g. captured by a batch worker.
+    """
+    disable = verbose or not sys.stdout.isatty()
+    return tqdm(iterable, desc=desc, total=total, unit=unit, file=sys.stdout, disable=disable, leave=False)
 
-            page_count += 1
-            mode_str = "mono" if mono else "color"
-            print(f"  Rendered: {image_filename} ({pix.width}x{pix.height}px, {dpi}dpi, {mode_str})")
 
-            # Get caption from LM Studio if enabled
-            if use_captions:
-                print(f"    Getting caption from LM Studio...")
-                caption = get_image_caption_from_lm_studio(image_filename)
-                if caption:
-                    captions[f"page{page_num + 1}"] = caption
-                    print(f"    Caption: {caption[:100]}..." if len(caption) > 100 else f"    Caption: {caption}")
+@contextmanager
+def _open_pdf(pdf):
+    """Yield an open fitz.Document for a path, or an already open Document as is (left open)."""
+    if isinstance(pdf, fitz.Document):
+        yield pdf
+        return
 
+    doc = fitz.open(pdf)
+    try:
+        yield doc
+    finally:
         doc.close()
-        return page_count, captions
+
+
+# Worker processes handling PDFs when a directory is processed
+PDF_BATCH_WORKERS = int(os.getenv("PDF_BATCH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+# Worker processes used to render the pages of one PDF
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+
+def configure_batch_worker(batch_workers):
+    """
+    Process pool initializer for workers that each extract one PDF at a time.
+
+    PDF_RENDER_WORKERS and LM_STUDIO_CONCURRENCY are budgets for the whole run,
+    so each of the batch_workers processes gets an equal share (at least one)
+    rather than its own full set of render processes and caption threads.
+    """
+    global PDF_RENDER_WORKERS, LM_STUDIO_CONCURRENCY
+    PDF_RENDER_WORKERS = max(1, PDF_RENDER_WORKERS // batch_workers)
+    LM_STUDIO_CONCURRENCY = max(1, LM_STUDIO_CONCURRENCY // batch_workers)
+
+# Pages whose most common color covers at least this share of pixels count as
+# blank and aren't sent for captioning
+BLANK_PAGE_RATIO = 0.995
+BLANK_PAGE_CAPTION = "[blank page]"
+
+# Also skip captioning pages with text but no images or drawings
+LM_STUDIO_SKIP_TEXT_ONLY = os.getenv("LM_STUDIO_SKIP_TEXT_ONLY", "false").lower() == "true"
+
+# Write page renders with light zlib compression (faster, larger files)
+PDF_RENDER_FAST = os.getenv("PDF_RENDER_FAST", "false").lower() == "true"
+
+# Page render file format: "png" (lossless) or "jpg" (much smaller, faster to encode)
+PDF_RENDER_FORMAT = os.getenv("PDF_RENDER_FORMAT", "png").lower()
+RENDER_FORMATS = ("png", "jpg")
+JPEG_QUALITY = 85
+
+# Reuse one caption for visually near-identical pages of a PDF (same difference
+# hash), e.g. repeated section dividers; off by default as similar layouts with
+# different content can collide
+CAPTION_DEDUPE_PAGES = os.getenv("CAPTION_DEDUPE_PAGES", "false").lower() == "true"
+DHASH_SIZE = 16  # 16x16 = 256-bit hash
+
+
+class RenderedPage(NamedTuple):
+    """Result of rendering one page (sorts by page number)"""
+    page_num: int  # Zero-based page index
+    image_filename: str  # Saved PNG or JPEG
+    width: int
+    height: int
+    caption_png: Optional[bytes] = None  # Lower-DPI rendering for the vision model
+    skip_caption: Optional[str] = None  # "blank" or "text_only" when not worth captioning
+    dhash: Optional[bytes] = None  # Difference hash, with CAPTION_DEDUPE_PAGES
+
+
+# (pdf_path, fitz.Document) opened once per render worker process
+_worker_doc = None
+
+
+def _pixmap_image(pix):
+    """Wrap a pixmap's samples in a PIL image."""
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}[pix.n]
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def _fast_png(pix):
+    """Encode a pixmap as PNG with zlib level 1 instead of PyMuPDF's default."""
+    buffer = io.BytesIO()
+    _pixmap_image(pix).save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _dhash(pix, size=DHASH_SIZE):
+    """
+    Difference hash of a pixmap: one bit per pixel of a (size + 1) x size
+    grayscale thumbnail, set when it is brighter than its left neighbour.
+    """
+    small = _pixmap_image(pix).convert("L").resize((size + 1, size)).tobytes()
+    row = size + 1
+    bits = "".join(
+        "1" if small[y * row + x + 1] > small[y * row + x] else "0"
+        for y in range(size) for x in range(size)
+    )
+    return int(bits, 2).to_bytes(size * size // 8, "big")
+
+
+@functools.lru_cache(maxsize=None)
+def _pixmap_kwargs(dpi, mono):
+    """get_pixmap() arguments for a DPI and color mode, built once rather than per page."""
+    mat = fitz.Matrix(dpi / 72, dpi / 72)  # 72 is default DPI
+    return {"matrix": mat, "colorspace": fitz.csGRAY} if mono else {"matrix": mat}
+
+
+def _render_page(doc, page_num, dpi, mono, output_dir, caption_dpi=None, fast_encode=False, image_format="png"):
+    """
+    Render one page to a PNG (quickly compressed with fast_encode) or JPEG in output_dir.
+
+    When caption_dpi is set, the page is checked for being blank (or text
+    only, with LM_STUDIO_SKIP_TEXT_ONLY) so it can skip captioning. Otherwise,
+    if caption_dpi is lower than dpi, a second, smaller rendering is made for
+    the vision model; if not, the saved image bytes are passed along as is.
+
+    Returns:
+        RenderedPage
+    """
+    page = doc[page_num]
+
+    # Render page to image at specified DPI, with or without color
+    # Higher DPI = better quality but larger files
+    pix = page.get_pixmap(**_pixmap_kwargs(dpi, mono))
+
+    image_filename = f"{output_dir}/page{page_num + 1}_rendered.{image_format}"
+    # Drop this page's render from an earlier run in another format
+    for other_format in RENDER_FORMATS:
+        if other_format != image_format:
+            Path(f"{output_dir}/page{page_num + 1}_rendered.{other_format}").unlink(missing_ok=True)
+    if image_format == "png" and not caption_dpi and not fast_encode:
+        pix.save(image_filename)
+        return RenderedPage(page_num, image_filename, pix.width, pix.height)
+
+    # Encode once so the same bytes can be captioned without reading the file back
+    if image_format == "jpg":
+        image_bytes = pix.tobytes("jpg", jpg_quality=JPEG_QUALITY)
+    elif fast_encode:
+        image_bytes = _fast_png(pix)
+    else:
+        image_bytes = pix.tobytes("png")
+    Path(image_filename).write_bytes(image_bytes)
+    if not caption_dpi:
+        return RenderedPage(page_num, image_filename, pix.width, pix.height)
+
+    # Cheap checks that make the vision model call unnecessary
+    if pix.color_topusage()[0] >= BLANK_PAGE_RATIO:
+        return RenderedPage(page_num, image_filename, pix.width, pix.height, skip_caption="blank")
+    if LM_STUDIO_SKIP_TEXT_ONLY and not page.get_images() and not page.get_drawings() and page.get_text().strip():
+        return RenderedPage(page_num, image_filename, pix.width, pix.height, skip_caption="text_only")
+
+    caption_pix = pix
+    if caption_dpi < dpi:
+        caption_pix = page.get_pixmap(**_pixmap_kwargs(caption_dpi, mono))
+        caption_png = caption_pix.tobytes("png")
+    elif len(image_bytes) <= CAPTION_MAX_BYTES:
+        caption_png = image_bytes
+    else:
+        # Too large to send as is; the captioner downscales the saved file
+        caption_png = None
+
+    dhash = _dhash(caption_pix) if CAPTION_DEDUPE_PAGES else None
+    return RenderedPage(page_num, image_filename, pix.width, pix.height, caption_png, dhash=dhash)
+
+
+def _render_page_in_worker(pdf_path, page_num, dpi, mono, output_dir, caption_dpi=None, fast_encode=False,
+                           image_format="png"):
+    """Render a page in a pool worker, opening the PDF only once per process."""
+    global _worker_doc
+    if _worker_doc is None or _worker_doc[0] != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+        _worker_doc = (pdf_path, fitz.open(pdf_path))
+    return _render_page(_worker_doc[1], page_num, dpi, mono, output_dir, caption_dpi, fast_encode, image_format)
+
+
+def render_pages_to_images(pdf_path, output_dir, dpi=None, use_captions=True, mono=False, fast_encode=None,
+                           image_format=None, verbose=False):
+    """
+    Render each PDF page to an image (captures vector graphics like graphs/charts).
+
+    Args:
+        pdf_path: Path to the PDF file (or an open fitz.Document)
+        output_dir: Directory to save rendered page images
+        dpi: Resolution for rendering (uses env var if not provided, default 150)
+        use_captions: Whether to generate captions using LM Studio (default True)
+        mono: Whether to render in monochrome/grayscale (default False)
+        fast_encode: Trade PNG size for encoding speed (uses env var if not provided)
+        image_format: "png" or "jpg" (uses env var if not provided, default png)
+        verbose: Print every rendered page and caption instead of a progress bar
+
+    Returns:
+        Tuple of (number of pages rendered, captions dictionary, number of
+        pages whose caption request failed)
+    """
+    # Use environment variables if not provided
+    if dpi is None:
+        dpi = int(os.getenv("PDF_RENDER_DPI", "150"))
+    if fast_encode is None:
+        fast_encode = PDF_RENDER_FAST
+    if image_format is None:
+        image_format = PDF_RENDER_FORMAT
+    if image_format not in RENDER_FORMATS:
+        print(f"Warning: Unknown render format '{image_format}', using png")
+        image_format = "png"
+
+    try:
+        # Captions are made from a lower-resolution rendering (vision models downscale anyway)
+        caption_dpi = CAPTION_RENDER_DPI if use_captions else None
+
+        rendered = []
+        captions = {}
+        caption_jobs = []  # (pages, future) per caption request
+        batch = []
+        first_by_hash = {}  # dhash -> page_num of the first page captioned for it
+        duplicates = {}  # page_num -> page_num whose caption it reuses
+
+        # Caption requests (I/O-bound) run on threads while later pages are still rendering
+        with ThreadPoolExecutor(max_workers=LM_STUDIO_CONCURRENCY) as caption_pool:
+            def submit_batch():
+                pages = list(batch)
+                job = [(page.image_filename, page.caption_png) for page in pages]
+                caption_jobs.append((pages, caption_pool.submit(get_image_captions_batch, job)))
+                batch.clear()
+
+            def on_rendered(page):
+                rendered.append(page)
+                if page.skip_caption == "blank":
+                    captions[f"page{page.page_num + 1}"] = BLANK_PAGE_CAPTION
+                elif page.skip_caption is None and use_captions:
+                    if page.dhash is not None:
+                        first = first_by_hash.setdefault(page.dhash, page.page_num)
+                        if first != page.page_num:
+                            duplicates[page.page_num] = first
+                            return
+                    batch.append(page)
+                    if len(batch) >= max(1, LM_STUDIO_BATCH_SIZE):
+                        submit_batch()
+
+            with _open_pdf(pdf_path) as doc:
+                total_pages = len(doc)
+                workers = min(PDF_RENDER_WORKERS, total_pages)
+                if workers > 1:
+                    # Rendering holds the GIL, so pages are spread over processes (each opens the file)
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        futures = [
+                            executor.submit(
+                                _render_page_in_worker, doc.name, page_num, dpi, mono, output_dir, caption_dpi,
+                                fast_encode, image_format
+                            )
+                            for page_num in range(total_pages)
+                        ]
+                        for future in _progress(as_completed(futures), "Rendering", total_pages, verbose):
+                            on_rendered(future.result())
+                else:
+                    for page_num in _progress(range(total_pages), "Rendering", verbose=verbose):
+                        on_rendered(_render_page(doc, page_num, dpi, mono, output_dir, caption_dpi, fast_encode,
+                                                 image_format))
+
+            if batch:
+                submit_batch()
+
+            rendered.sort()
+            if verbose:
+                mode_str = "mono" if mono else "color"
+                for page in rendered:
+                    print(f"  Rendered: {page.image_filename} ({page.width}x{page.height}px, {dpi}dpi, {mode_str})")
+
+            if caption_jobs:
+                captioned = sum(len(pages) for pages, _ in caption_jobs)
+                skipped = len(rendered) - captioned
+                print(f"  Getting captions from LM Studio for {captioned} page(s)..."
+                      + (f" ({skipped} blank/text-only/repeated skipped)" if skipped else ""))
+
+        # Every caption request has finished once the pool is shut down
+        page_captions = sorted(
+            (page.page_num, caption)
+            for pages, future in caption_jobs
+            for page, caption in zip(pages, future.result())
+        )
+        for page_num, caption in page_captions:
+            if caption:
+                captions[f"page{page_num + 1}"] = caption
+                if verbose:
+                    print(f"    Page {page_num + 1} caption: {caption[:100]}..." if len(caption) > 100 else f"    Page {page_num + 1} caption: {caption}")
+
+        # Near-identical pages share the caption of the first one
+        for page_num, first in duplicates.items():
+            if f"page{first + 1}" in captions:
+                captions[f"page{page_num + 1}"] = captions[f"page{first + 1}"]
+        if duplicates:
+            print(f"  Reused captions for {len(duplicates)} near-identical page(s)")
+
+        # Pages sent for captioning (or sharing such a page's caption) left without one
+        failed = sum(1 for _, caption in page_captions if not caption)
+        failed += sum(1 for page_num in duplicates if f"page{page_num + 1}" not in captions)
+        if failed:
+            print(f"  Warning: {failed} page(s) could not be captioned")
+
+        return len(rendered), captions, failed
 
     except FileNotFoundError:
         print(f"Error: File '{pdf_path}' not found.")
         sys.exit(1)
     except Exception as e:
         print(f"Error rendering pages: {e}")
-        return 0, {}
+        return 0, {}, 0
 
 
-def extract_images_from_pdf(pdf_path, output_dir):
+def extract_images_from_pdf(pdf_path, output_dir, verbose=False):
     """
     Extract embedded images from a PDF file.
 
+    An image used on several pages is saved once, under the first page it appears on.
+
     Args:
-        pdf_path: Path to the PDF file
+        pdf_path: Path to the PDF file (or an open fitz.Document)
         output_dir: Directory to save extracted images
+        verbose: Print every extracted or skipped image instead of a progress bar
 
     Returns:
         Number of images extracted
     """
     try:
-        doc = fitz.open(pdf_path)
-        image_count = 0
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            image_list = page.get_images()
-
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
+        with _open_pdf(pdf_path) as doc:
+            # First occurrence of each image; repeats (logos, headers) aren't decoded again
+            first_seen = {}
+            repeats = 0
+            for page_num in range(len(doc)):
+                for img_index, img in enumerate(doc[page_num].get_images()):
+                    xref = img[0]
+                    if xref in first_seen:
+                        repeats += 1
+                    else:
+                        first_seen[xref] = (page_num, img_index)
+
+            image_count = 0
+            too_small = 0
+            for xref, (page_num, img_index) in _progress(
+                first_seen.items(), "Extracting images", len(first_seen), verbose, unit="image"
+            ):
                 base_image = doc.extract_image(xref)
                 image_bytes = base_image["image"]
                 image_ext = base_image["ext"]
@@ -185,18 +646,25 @@ def extract_images_from_pdf(pdf_path, output_dir):
 
                 # Skip images that are 1 pixel wide or tall (likely decorative lines)
                 if width <= 1 or height <= 1:
-                    print(f"  Skipped: page{page_num + 1}_img{img_index + 1} ({width}x{height}px - too small)")
+                    too_small += 1
+                    if verbose:
+                        print(f"  Skipped: page{page_num + 1}_img{img_index + 1} ({width}x{height}px - too small)")
                     continue
 
-                # Save image
+                # Save image (named after the page it first appears on)
                 image_filename = f"{output_dir}/page{page_num + 1}_img{img_index + 1}.{image_ext}"
                 with open(image_filename, "wb") as image_file:
                     image_file.write(image_bytes)
 
                 image_count += 1
-                print(f"  Extracted: {image_filename} ({width}x{height}px)")
+                if verbose:
+                    print(f"  Extracted: {image_filename} ({width}x{height}px)")
+
+            if too_small:
+                print(f"  Skipped {too_small} image(s) 1 pixel wide or tall")
+            if repeats:
+                print(f"  Skipped {repeats} repeated occurrence(s) of images already extracted")
 
-        doc.close()
         return image_count
 
     except FileNotFoundError:
@@ -212,26 +680,60 @@ def extract_text_from_pdf(pdf_path):
     Extract text from a PDF file.
 
     Args:
-        pdf_path: Path to the PDF file
+        pdf_path: Path to the PDF file (or an open fitz.Document)
 
     Returns:
         Extracted text as a string
     """
-    text = ""
+    parts = []
 
     try:
-        doc = fitz.open(pdf_path)
-        num_pages = len(doc)
+        with _open_pdf(pdf_path) as doc:
+            num_pages = len(doc)
 
-        print(f"Processing {num_pages} pages...")
+            print(f"Processing {num_pages} pages...")
 
-        for page_num in range(num_pages):
-            page = doc[page_num]
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page.get_text()
+            for page_num in range(num_pages):
+                page = doc[page_num]
+                parts.append(f"\n--- Page {page_num + 1} ---\n")
+                parts.append(page.get_text())
 
-        doc.close()
-        return text
+        return "".join(parts)
+
+    except FileNotFoundError:
+        print(f"Error: File '{pdf_path}' not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error processing PDF: {e}")
+        sys.exit(1)
+
+
+def stream_text_to_file(pdf_path, output_path):
+    """
+    Extract text from a PDF file straight into a file, one page at a time.
+
+    Produces the same content as extract_text_from_pdf() + save_text_to_file()
+    without holding the whole document's text in memory.
+
+    Args:
+        pdf_path: Path to the PDF file (or an open fitz.Document)
+        output_path: Path to the output file
+    """
+    try:
+        with _open_pdf(pdf_path) as doc:
+            num_pages = len(doc)
+            print(f"Processing {num_pages} pages...")
+
+            try:
+                with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as file:
+                    for page_num in range(num_pages):
+                        file.write(f"\n--- Page {page_num + 1} ---\n")
+                        file.write(doc[page_num].get_text())
+            except OSError as e:
+                print(f"Error saving file: {e}")
+                sys.exit(1)
+
+        print(f"Text successfully saved to: {output_path}")
 
     except FileNotFoundError:
         print(f"Error: File '{pdf_path}' not found.")
@@ -258,7 +760,31 @@ def save_text_to_file(text, output_path):
         sys.exit(1)
 
 
-def process_single_pdf(pdf_path, output_dir, render_only=False, dpi=None, mono=False, use_captions=True):
+# Written to an output directory after a successful extraction; a matching
+# stamp means the PDF and the settings are unchanged and the run can be skipped
+STAMP_FILENAME = ".stamp.json"
+
+
+def _extraction_stamp(pdf_path, **settings):
+    """Return the stamp for a PDF and extraction settings, or None if the PDF can't be stat'ed."""
+    try:
+        stat = os.stat(pdf_path)
+    except OSError:
+        return None
+    return {"mtime": stat.st_mtime, "size": stat.st_size, **settings}
+
+
+def _read_stamp(stamp_path):
+    """Return the stamp saved in an output directory, or None."""
+    try:
+        with open(stamp_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def process_single_pdf(pdf_path, output_dir, render_only=False, dpi=None, mono=False, use_captions=True,
+                       fast_encode=None, image_format=None, force=False, verbose=False):
     """
     Process a single PDF file: extract text, render pages, and extract images.
 
@@ -269,21 +795,78 @@ def process_single_pdf(pdf_path, output_dir, render_only=False, dpi=None, mono=F
         dpi: Resolution for rendering (uses env var if not provided)
         mono: Whether to render in monochrome/grayscale
         use_captions: Whether to generate captions using LM Studio
+        fast_encode: Write page renders with fast, light PNG compression (uses env var if not provided)
+        image_format: Page render format, "png" or "jpg" (uses env var if not provided)
+        force: Process the PDF even if output_dir holds an up-to-date extraction
+        verbose: Print every rendered page, caption and image instead of progress bars
     """
     print(f"{'Rendering' if render_only else 'Extracting content from'}: {pdf_path}")
     print(f"Output directory: {output_dir}\n")
 
+    # With LM Studio disabled there is nothing to caption (and no caption to retry later)
+    use_captions = use_captions and os.getenv("LM_STUDIO_ENABLED", "true").lower() != "false"
+
+    # Skip PDFs already extracted with the same settings
+    stamp = _extraction_stamp(
+        pdf_path,
+        dpi=dpi if dpi is not None else int(os.getenv("PDF_RENDER_DPI", "150")),
+        mono=mono,
+        captions=use_captions,
+        render_only=render_only,
+        format=image_format or PDF_RENDER_FORMAT
+    )
+    stamp_path = Path(output_dir) / STAMP_FILENAME
+    if stamp is not None and not force and _read_stamp(stamp_path) == stamp:
+        print("Skipping (up-to-date, use --force to reprocess)")
+        return
+
+    # Open the PDF once for every pass (each open re-parses the xref table)
+    try:
+        doc = fitz.open(pdf_path)
+    except FileNotFoundError:
+        print(f"Error: File '{pdf_path}' not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error processing PDF: {e}")
+        sys.exit(1)
+
+    try:
+        complete = _process_doc(
+            doc, output_dir, render_only, dpi, mono, use_captions, fast_encode, image_format, verbose
+        )
+    finally:
+        doc.close()
+
+    if complete and stamp is not None:
+        with open(stamp_path, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f)
+
+    print(f"\nDone! All content saved to: {output_dir}/")
+
+
+def _process_doc(doc, output_dir, render_only, dpi, mono, use_captions, fast_encode, image_format, verbose):
+    """
+    Run the extraction passes of process_single_pdf() on an open document.
+
+    Returns:
+        True if every page was rendered and, with captions enabled, every caption
+        request succeeded and the captions were saved
+    """
+
     if not render_only:
         # Extract text
         print("Extracting text...")
-        text = extract_text_from_pdf(pdf_path)
         text_output_path = f"{output_dir}/extracted_text.txt"
-        save_text_to_file(text, text_output_path)
+        stream_text_to_file(doc, text_output_path)
 
     # Render pages to images (captures vector graphics like graphs/charts)
     print("\nRendering pages to images...")
-    page_count, captions = render_pages_to_images(pdf_path, output_dir, dpi=dpi, use_captions=use_captions, mono=mono)
-    print(f"Rendered {page_count} page(s)")
+    page_count, captions, failed_captions = render_pages_to_images(
+        doc, output_dir, dpi=dpi, use_captions=use_captions, mono=mono, fast_encode=fast_encode,
+        image_format=image_format, verbose=verbose
+    )
+    print(f"Rendered {page_count} page(s)" + (f", {len(captions)} caption(s)" if captions else ""))
+    complete = page_count == len(doc) > 0 and failed_captions == 0
 
     # Save captions to a file
     if captions:
@@ -294,18 +877,34 @@ def process_single_pdf(pdf_path, output_dir, render_only=False, dpi=None, mono=F
             print(f"\nCaptions saved to: {captions_path}")
         except Exception as e:
             print(f"\nWarning: Could not save captions: {e}")
+            complete = False
 
     if not render_only:
         # Extract embedded images
         print("\nExtracting embedded images...")
-        image_count = extract_images_from_pdf(pdf_path, output_dir)
+        image_count = extract_images_from_pdf(doc, output_dir, verbose=verbose)
 
         if image_count > 0:
             print(f"Extracted {image_count} embedded image(s)")
         else:
             print("No embedded images found in PDF")
 
-    print(f"\nDone! All content saved to: {output_dir}/")
+    return complete
+
+
+def _process_pdf_captured(pdf_path, output_dir, **kwargs):
+    """Run process_single_pdf() in a batch worker and return its output as a string."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            process_single_pdf(pdf_path, output_dir, **kwargs)
+        except SystemExit as e:
+            # The extraction helpers exit on unrecoverable errors; keep the batch going
+            print(f"Error: processing stopped (exit status {e.code})")
+        except Exception as e:
+            # Reported with this PDF's output rather than raised from future.result()
+            print(f"Error processing PDF: {e}")
+    return output.getvalue()
 
 
 def main():
@@ -318,6 +917,7 @@ Examples:
   python pdf_extractor.py ./pdfs/
   python pdf_extractor.py document.pdf --render-only --dpi 300
   python pdf_extractor.py document.pdf --mono --dpi 200
+  python pdf_extractor.py document.pdf --format jpg
   python pdf_extractor.py document.pdf -o output_folder --render-only --dpi 150 --mono
         """
     )
@@ -346,6 +946,18 @@ Examples:
         action="store_true",
         help="Render pages in monochrome/grayscale instead of color"
     )
+    parser.add_argument(
+        "--fast-encode",
+        action="store_true",
+        default=None,
+        help="Write page renders with light PNG compression: faster, larger files (default: from PDF_RENDER_FAST env var)"
+    )
+    parser.add_argument(
+        "--format",
+        dest="image_format",
+        choices=RENDER_FORMATS,
+        help="File format of page renders (default: from PDF_RENDER_FORMAT env var or png)"
+    )
     parser.add_argument(
         "--no-captions",
         action="store_true",
@@ -356,6 +968,16 @@ Examples:
         action="store_true",
         help="Enable captions even in --render-only mode (captions are disabled by default in render-only mode)"
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess PDFs whose output directory is up to date with the PDF and settings"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Print every rendered page, caption and extracted image instead of progress bars"
+    )
 
     args = parser.parse_args()
 
@@ -394,7 +1016,11 @@ Examples:
             render_only=args.render_only,
             dpi=args.dpi,
             mono=args.mono,
-            use_captions=use_captions
+            use_captions=use_captions,
+            fast_encode=args.fast_encode,
+            image_format=args.image_format,
+            force=args.force,
+            verbose=args.verbose
         )
 
     elif input_path.is_dir():
@@ -411,24 +1037,43 @@ Examples:
         # Create base output directory
         Path(base_output_dir).mkdir(parents=True, exist_ok=True)
 
-        # Process each PDF
-        for idx, pdf_file in enumerate(pdf_files, 1):
-            print(f"\n[{idx}/{len(pdf_files)}] Processing: {pdf_file.name}")
-            print("="*60)
-
-            # Create subdirectory for this PDF
-            output_dir = Path(base_output_dir) / pdf_file.stem
-            output_dir.mkdir(parents=True, exist_ok=True)
-
-            process_single_pdf(
-                str(pdf_file),
-                str(output_dir),
-                render_only=args.render_only,
-                dpi=args.dpi,
-                mono=args.mono,
-                use_captions=use_captions
-            )
-            print("="*60)
+        # Process the PDFs in parallel, each into its own subdirectory
+        workers = min(PDF_BATCH_WORKERS, len(pdf_files))
+        print(f"Workers: {workers}")
+        # Workers split the render and caption budgets instead of each using all of them
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=configure_batch_worker, initargs=(workers,)
+        ) as executor:
+            futures = {}
+            for idx, pdf_file in enumerate(pdf_files, 1):
+                output_dir = Path(base_output_dir) / pdf_file.stem
+                output_dir.mkdir(parents=True, exist_ok=True)
+                future = executor.submit(
+                    _process_pdf_captured,
+                    str(pdf_file),
+                    str(output_dir),
+                    render_only=args.render_only,
+                    dpi=args.dpi,
+                    mono=args.mono,
+                    use_captions=use_captions,
+                    fast_encode=args.fast_encode,
+                    image_format=args.image_format,
+                    force=args.force,
+                    verbose=args.verbose
+                )
+                futures[future] = (idx, pdf_file)
+
+            # Each PDF's output is printed in one piece as it finishes
+            for future in as_completed(futures):
+                idx, pdf_file = futures[future]
+                print(f"\n[{idx}/{len(pdf_files)}] Processing: {pdf_file.name}")
+                print("="*60)
+                try:
+                    print(future.result())
+                except Exception as e:
+                    # The worker process itself failed (e.g. was killed)
+                    print(f"Error: {e}")
+                print("="*60)
 
         print(f"\n\nAll PDFs processed! Output saved to: {base_output_dir}/")
 